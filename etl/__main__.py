@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
 import os
+import tempfile
 
 import click
 
+from . import compress, http_cache, snapshot
 from .firefox_legacy_etl import write_firefox_legacy_metadata
+from .glean import DEFAULT_FETCH_CONCURRENCY
 from .glean_etl import write_glean_metadata
+from .manifest import DEFAULT_MANIFEST_DIR
 
 OUTPUT_DIRECTORY = os.path.join("public", "data")
 FUNCTIONS_DIRECTORY = ".netlify"
@@ -19,14 +23,160 @@ def cli():
 @cli.command()
 @click.option("--output-directory", default=OUTPUT_DIRECTORY)
 @click.option("--functions-directory", default=FUNCTIONS_DIRECTORY)
+@click.option(
+    "--fetch-concurrency",
+    default=DEFAULT_FETCH_CONCURRENCY,
+    show_default=True,
+    help="Maximum number of probeinfo requests to make in parallel",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of worker processes to write out app groups with",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Rebuild every application, even if its inputs haven't changed since the last build",
+)
+@click.option(
+    "--stream-metrics",
+    is_flag=True,
+    help="Write out each metric as soon as it's complete, to bound memory use on large apps",
+)
+@click.option(
+    "--compress",
+    "compress_output",
+    is_flag=True,
+    help="Also write pre-compressed (gzip, and brotli if installed) variants of the data files",
+)
+@click.option(
+    "--cache-dir",
+    default=http_cache.DEFAULT_CACHE_DIR,
+    show_default=True,
+    help="Directory to cache upstream HTTP responses in",
+)
+@click.option(
+    "--manifest-dir",
+    default=DEFAULT_MANIFEST_DIR,
+    show_default=True,
+    help="Directory to keep the manifests of builds (used to skip unchanged applications) in",
+)
+@click.option(
+    "--record",
+    type=click.Path(dir_okay=False),
+    help="Record every upstream resource the build consumes into a snapshot file",
+)
+@click.option(
+    "--replay",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Build from a snapshot file recorded with --record, without network access",
+)
+@click.option(
+    "--mps-path",
+    type=click.Path(exists=True, file_okay=False),
+    help="Use a local copy of mozilla-pipeline-schemas (with the generated-schemas branch "
+    "checked out) instead of managing our own checkout",
+)
 @click.argument("app_names", nargs=-1, required=False)
-def build_metadata(output_directory, functions_directory, app_names):
-    write_glean_metadata(
-        output_directory,
-        functions_directory,
-        app_names=app_names,
-    )
-    write_firefox_legacy_metadata(output_directory, functions_directory)
+def build_metadata(
+    output_directory,
+    functions_directory,
+    fetch_concurrency,
+    jobs,
+    force,
+    stream_metrics,
+    compress_output,
+    cache_dir,
+    manifest_dir,
+    record,
+    replay,
+    mps_path,
+    app_names,
+):
+    if record and replay:
+        raise click.UsageError("--record and --replay are mutually exclusive")
+    if mps_path and replay:
+        raise click.UsageError("--mps-path can't be used with --replay")
+    if record and jobs > 1:
+        raise click.UsageError("--record can't be used with more than one job")
+
+    if replay:
+        replayed = snapshot.Snapshot.load(replay)
+        http_cache.set_http_cache(snapshot.ReplayHttpCache(replayed))
+        with tempfile.TemporaryDirectory(suffix="_mps") as mps_path:
+            replayed.extract_files(mps_path)
+            glean_report = write_glean_metadata(
+                output_directory,
+                functions_directory,
+                app_names=app_names,
+                fetch_concurrency=fetch_concurrency,
+                mps_path=mps_path,
+                jobs=jobs,
+                force=force,
+                stream_metrics=stream_metrics,
+                manifest_dir=manifest_dir,
+            )
+        legacy_report = write_firefox_legacy_metadata(output_directory, functions_directory)
+    else:
+        cache = http_cache.HttpCache(cache_dir)
+        recording = snapshot.Snapshot() if record else None
+        http_cache.set_http_cache(
+            snapshot.RecordingHttpCache(cache, recording) if recording else cache
+        )
+        glean_report = write_glean_metadata(
+            output_directory,
+            functions_directory,
+            app_names=app_names,
+            fetch_concurrency=fetch_concurrency,
+            mps_path=mps_path,
+            snapshot=recording,
+            jobs=jobs,
+            force=force,
+            stream_metrics=stream_metrics,
+            manifest_dir=manifest_dir,
+        )
+        legacy_report = write_firefox_legacy_metadata(output_directory, functions_directory)
+        if recording:
+            recording.save(record)
+        cache.prune()
+
+    click.echo(glean_report)
+    click.echo(legacy_report)
+    if compress_output:
+        click.echo(compress.format_size_report(compress.compress_directory(output_directory)))
+
+
+@cli.group()
+def cache():
+    """Inspect or manage the on-disk HTTP cache"""
+    pass
+
+
+@cache.command()
+@click.option("--cache-dir", default=http_cache.DEFAULT_CACHE_DIR, show_default=True)
+def stats(cache_dir):
+    cache_stats = http_cache.HttpCache(cache_dir).stats()
+    click.echo(f"Directory: {cache_stats['directory']}")
+    click.echo(f"Entries: {cache_stats['entries']}")
+    click.echo(f"Size: {cache_stats['size']} bytes")
+
+
+@cache.command()
+@click.option("--cache-dir", default=http_cache.DEFAULT_CACHE_DIR, show_default=True)
+@click.option(
+    "--max-size",
+    type=int,
+    default=http_cache.DEFAULT_CACHE_MAX_SIZE,
+    show_default=True,
+    help="Size (in bytes) to shrink the cache to, evicting the least recently used entries",
+)
+def prune(cache_dir, max_size):
+    evicted = http_cache.HttpCache(cache_dir).prune(max_size)
+    click.echo(f"Evicted {evicted} entries")
 
 
 if __name__ == "__main__":
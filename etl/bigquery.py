@@ -1,14 +1,14 @@
-import stringcase
+from .identifiers import snakecase
 
 
 def get_bigquery_ping_table_name(dataset_name, ping_name):
-    ping_name_snakecase = stringcase.snakecase(ping_name)
+    ping_name_snakecase = snakecase(ping_name)
     return f"{dataset_name}.{ping_name_snakecase}"
 
 
 def get_bigquery_column_name(metric):
     metric_type = metric.definition["type"]
-    metric_name_snakecase = stringcase.snakecase(metric.identifier)
+    metric_name_snakecase = snakecase(metric.identifier)
     return (
         f"{metric.bq_prefix}.{metric_name_snakecase}"
         if metric.bq_prefix
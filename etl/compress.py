@@ -0,0 +1,128 @@
+"""
+Pre-compressed variants of the generated data files.
+
+For every text file (e.g. JSON; images like the app logos are already
+compressed) we write a gzip (`.gz`) and, if the optional `brotli` package
+is installed, a brotli (`.br`) sibling, so that the largest pages can be
+served compressed without compressing them on every request. Only files which
+changed since their variants were last written are compressed again.
+"""
+
+import gzip
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .utils import write_atomic
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_SUFFIX = ".gz"
+BROTLI_SUFFIX = ".br"
+COMPRESSED_SUFFIXES = (GZIP_SUFFIX, BROTLI_SUFFIX)
+# the files worth compressing
+COMPRESSIBLE_EXTENSIONS = (".json", ".js")
+
+
+def _gzip_compress(data: bytes) -> bytes:
+    # a fixed mtime keeps the output the same for the same input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli_compress(data: bytes) -> bytes:
+    return brotli.compress(data)
+
+
+_COMPRESSORS = {GZIP_SUFFIX: _gzip_compress, BROTLI_SUFFIX: _brotli_compress}
+
+
+def get_compressed_suffixes():
+    """
+    The compressed variants we can write out
+    """
+    return [GZIP_SUFFIX] + ([BROTLI_SUFFIX] if brotli is not None else [])
+
+
+def _compress_file(path, suffixes):
+    with open(path, "rb") as f:
+        data = f.read()
+    return {
+        suffix: write_atomic(path + suffix, [_COMPRESSORS[suffix](data)]) for suffix in suffixes
+    }
+
+
+def compress_directory(directory, max_workers=None) -> dict:
+    """
+    Write compressed variants of every text file underneath `directory` which
+    changed since its variants were last written (compressing in parallel,
+    with up to `max_workers` processes), and remove variants whose file no
+    longer exists (or isn't one we compress). Returns a summary of the sizes involved (see
+    `format_size_report`).
+    """
+    suffixes = get_compressed_suffixes()
+    if brotli is None:
+        logging.warning("The brotli package isn't installed, only writing gzip variants")
+
+    stats = dict(files=0, compressed=0, size=0, compressed_sizes={suffix: 0 for suffix in suffixes})
+    pending = []
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            path = os.path.join(root, filename)
+            if filename.startswith("."):
+                # hidden files aren't served
+                continue
+            suffix = next((s for s in COMPRESSED_SUFFIXES if filename.endswith(s)), None)
+            if suffix is not None:
+                source_path = path[: -len(suffix)]
+                if not (
+                    source_path.endswith(COMPRESSIBLE_EXTENSIONS) and os.path.exists(source_path)
+                ):
+                    os.unlink(path)
+                continue
+            if not filename.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+
+            stats["files"] += 1
+            stats["size"] += os.path.getsize(path)
+            mtime = os.path.getmtime(path)
+            outdated = []
+            for suffix in suffixes:
+                if os.path.exists(path + suffix) and os.path.getmtime(path + suffix) >= mtime:
+                    stats["compressed_sizes"][suffix] += os.path.getsize(path + suffix)
+                else:
+                    outdated.append(suffix)
+            if outdated:
+                pending.append((path, outdated))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for sizes in executor.map(
+                _compress_file,
+                [path for (path, _) in pending],
+                [outdated for (_, outdated) in pending],
+                chunksize=64,
+            ):
+                stats["compressed"] += 1
+                for suffix, size in sizes.items():
+                    stats["compressed_sizes"][suffix] += size
+
+    return stats
+
+
+def _format_size(size):
+    return f"{size / 1024**2:.1f} MiB"
+
+
+def format_size_report(stats) -> str:
+    lines = [
+        f"Compressed {stats['compressed']} of {stats['files']} files "
+        f"({stats['files'] - stats['compressed']} unchanged), "
+        f"{_format_size(stats['size'])} in total"
+    ]
+    for suffix, size in stats["compressed_sizes"].items():
+        ratio = size / stats["size"] if stats["size"] else 0
+        lines.append(f"  {suffix}: {_format_size(size)} ({ratio:.0%} of the original size)")
+    return "\n".join(lines)
@@ -1,7 +1,48 @@
-def get_mapped_expiry(expiry, app_name, product_details):
+class ReleaseCatalog:
+    """
+    The history of Firefox major releases (as given by product-details),
+    used for mapping expiry versions. Results are memoized per (expiry, app),
+    since most metrics share a handful of expiry values.
+    """
+
+    def __init__(self, product_details):
+        # version (e.g. "100.0") -> release date
+        self.release_dates = product_details
+        self.latest_release_version = [*product_details][-1] if product_details else None
+        self._mapped_expiries = {}
+        self._expiry_texts = {}
+
+    def get_release_date(self, version):
+        return self.release_dates.get(f"{version}.0")
+
+    @staticmethod
+    def _memo_key(expiry, app_name):
+        # include the type, so that e.g. 100 and "100" (or 1 and True) are kept apart
+        return (type(expiry), expiry, app_name)
+
+    def get_mapped_expiry(self, expiry, app_name):
+        key = self._memo_key(expiry, app_name)
+        if key not in self._mapped_expiries:
+            self._mapped_expiries[key] = _get_mapped_expiry(expiry, app_name, self)
+        return self._mapped_expiries[key]
+
+    def get_expiry_text(self, expiry, app_name):
+        key = self._memo_key(expiry, app_name)
+        if key not in self._expiry_texts:
+            self._expiry_texts[key] = _get_expiry_text(expiry, app_name, self)
+        return self._expiry_texts[key]
+
+
+def _get_release_catalog(product_details) -> ReleaseCatalog:
+    if isinstance(product_details, ReleaseCatalog):
+        return product_details
+    return ReleaseCatalog(product_details)
+
+
+def _get_mapped_expiry(expiry, app_name, release_catalog):
     # For Desktop we can map expiry versions to dates.
     if app_name == "firefox_desktop":
-        details = product_details.get(f"{expiry}.0")
+        details = release_catalog.get_release_date(expiry)
         if details:
             return details
 
@@ -12,8 +53,8 @@ def get_mapped_expiry(expiry, app_name, product_details):
         return expiry
 
 
-def get_expiry_text(expiry, app_name, product_details):
-    latest_release_version = [*product_details][-1]
+def _get_expiry_text(expiry, app_name, release_catalog):
+    latest_release_version = release_catalog.latest_release_version
 
     if expiry == "never" or expiry is None:
         return expiry
@@ -25,3 +66,19 @@ def get_expiry_text(expiry, app_name, product_details):
      [{latest_release_version}](https://whattrainisitnow.com/)."
 
     return str(expiry)
+
+
+def get_mapped_expiry(expiry, app_name, product_details):
+    """
+    `product_details` is either a `ReleaseCatalog` or the product-details
+    payload it's built from
+    """
+    return _get_release_catalog(product_details).get_mapped_expiry(expiry, app_name)
+
+
+def get_expiry_text(expiry, app_name, product_details):
+    """
+    `product_details` is either a `ReleaseCatalog` or the product-details
+    payload it's built from
+    """
+    return _get_release_catalog(product_details).get_expiry_text(expiry, app_name)
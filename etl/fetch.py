@@ -0,0 +1,79 @@
+"""
+Shared HTTP client for everything the ETL fetches from upstream.
+
+All requests go through a single `requests.Session`, so connections to each
+host are kept alive and reused, every request has connect/read timeouts, and
+transient failures are retried with jittered exponential backoff.
+"""
+
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# should be at least as large as the number of requests we make in parallel
+POOL_MAXSIZE = 32
+
+
+class _JitteredRetry(Retry):
+    """
+    Exponential backoff with "full jitter", so that parallel requests which
+    fail together don't all retry at the same moment
+    """
+
+    def get_backoff_time(self):
+        return random.uniform(0, super().get_backoff_time())
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _create_session() -> requests.Session:
+    retry = _JitteredRetry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        # hand the final response back to the caller rather than raising
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session()
+        return _session
+
+
+def reset_session():
+    """
+    Start a new session for any further requests, e.g. in a forked process,
+    which mustn't reuse the connections it shares with its parent. (The old
+    session is only dropped, not closed, as that would affect the parent.)
+    """
+    global _session, _session_lock
+    _session = None
+    # (the lock might have been held by another thread at the time of the fork)
+    _session_lock = threading.Lock()
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    return get_session().get(url, **kwargs)
@@ -1,6 +1,5 @@
-import re
-
 from .glean import GLEAN_DISTRIBUTION_TYPES
+from .identifiers import etl_snake_case
 
 GLAM_PRODUCT_MAPPINGS = {
     "org.mozilla.fenix": ("fenix", ""),
@@ -25,20 +24,6 @@ SUPPORTED_GLAM_METRIC_TYPES = GLEAN_DISTRIBUTION_TYPES | {
     "labeled_timing_distribution",
 }
 
-# ETL specific snakecase taken from:
-# https://github.com/mozilla/bigquery-etl/blob/master/bigquery_etl/util/common.py
-#
-# Search for all camelCase situations in reverse with arbitrary lookaheads.
-REV_WORD_BOUND_PAT = re.compile(
-    r"""
-    \b                                  # standard word boundary
-    |(?<=[a-z][A-Z])(?=\d*[A-Z])        # A7Aa -> A7|Aa boundary
-    |(?<=[a-z][A-Z])(?=\d*[a-z])        # a7Aa -> a7|Aa boundary
-    |(?<=[A-Z])(?=\d*[a-z])             # a7A -> a7|A boundary
-    """,
-    re.VERBOSE,
-)
-
 GLAM_METRICS_BLOCKLIST = {
     "regex": (
         "search_counts|browser_search|event_counts|browser_engagement_navigation|"
@@ -82,16 +67,6 @@ GLAM_METRICS_BLOCKLIST = {
 }
 
 
-def etl_snake_case(line: str) -> str:
-    """Convert a string into a snake_cased string."""
-    # replace non-alphanumeric characters with spaces in the reversed line
-    subbed = re.sub(r"[^\w]|_", " ", line[::-1])
-    # apply the regex on the reversed string
-    words = REV_WORD_BOUND_PAT.split(subbed)
-    # filter spaces between words and snake_case and reverse again
-    return "_".join([w.lower() for w in words if w.strip()])[::-1]
-
-
 def get_glam_metadata_for_metric(app, metric, ping_name):
     # GLAM data is per application and per ping (well,
     # only the metrics ping right now), when it exists
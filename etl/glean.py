@@ -1,14 +1,21 @@
 from __future__ import annotations
 
 import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List
+from typing import Iterable, List
 
 import requests
 
+from . import http_cache
+
 logger = logging.getLogger(__name__)
 
 
+# Default number of probeinfo requests we allow to be in flight at once
+DEFAULT_FETCH_CONCURRENCY = 8
+
 GLEAN_DISTRIBUTION_TYPES = {
     "timing_distribution",
     "memory_distribution",
@@ -39,25 +46,160 @@ class _Cache:
 
     def __init__(self):
         self.cached_responses = {}
+        self.libraries = _LibraryRegistry(self)
+
+    def _fetch(self, url: str):
+        # the on-disk cache revalidates what it has against
+        # probeinfo.telemetry.mozilla.org, so we won't get stale data
+        return http_cache.get(url)
 
     def get(self, url: str):
-        if self.cached_responses.get(url):
+        if url in self.cached_responses:
             return self.cached_responses[url]
 
-        # pass a parameter to bypass any caching, which might give us stale
-        # data (probeinfo.telemetry.mozilla.org is currently using cloudfront)
-        resp = requests.get(url + f"?t={datetime.utcnow().isoformat()}")
+        resp = self._fetch(url)
         self.cached_responses[url] = resp
         return resp
 
+    def prefetch(self, urls: Iterable[str], max_workers: int = DEFAULT_FETCH_CONCURRENCY):
+        """
+        Fetch any of `urls` we haven't seen yet concurrently, so subsequent
+        calls to `get` are served from the cache
+        """
+        pending = [url for url in dict.fromkeys(urls) if url not in self.cached_responses]
+        if not pending:
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for url, resp in zip(pending, executor.map(self._fetch, pending)):
+                self.cached_responses[url] = resp
+
     def get_json(self, url: str):
         return self.get(url).json()
 
 
+class _LibraryRegistry:
+    """
+    The metrics and pings of each library, parsed once and shared by every
+    app which depends on the library (rather than parsed again for each app)
+    """
+
+    def __init__(self, cache: _Cache):
+        self._cache = cache
+        self._metrics = {}
+        self._ping_data = {}
+        self._libraries_by_dependency_name = None
+
+    def get_libraries_by_dependency_name(self) -> dict:
+        if self._libraries_by_dependency_name is None:
+            self._libraries_by_dependency_name = {
+                library["dependency_name"]: library for library in GleanApp.get_libraries()
+            }
+        return self._libraries_by_dependency_name
+
+    def get_metrics(self, library: dict) -> List[GleanMetric]:
+        """
+        The library's metrics, as sent by the library itself (i.e. without
+        `all-pings` expanded, see `GleanMetric.for_pings`)
+        """
+        key = (library["v1_name"], library["library_name"])
+        if key not in self._metrics:
+            data = self._cache.get_json(GleanApp.METRICS_URL_TEMPLATE.format(library["v1_name"]))
+            self._metrics[key] = [
+                GleanMetric(metric_name, {**metric_data, "origin": library["library_name"]})
+                for metric_name, metric_data in data.items()
+            ]
+        return self._metrics[key]
+
+    def get_ping_data(self, library: dict) -> dict:
+        key = (library["v1_name"], library["library_name"])
+        if key not in self._ping_data:
+            data = self._cache.get_json(GleanApp.PING_URL_TEMPLATE.format(library["v1_name"]))
+            self._ping_data[key] = {
+                ping_name: {**ping_data, "origin": library["library_name"]}
+                for ping_name, ping_data in data.items()
+            }
+        return self._ping_data[key]
+
+
 _cache = _Cache()
 
 
+def get_cached_responses(urls: Iterable[str]) -> dict:
+    """
+    The responses we've already fetched for any of `urls`, e.g. to hand on to
+    another process
+    """
+    return {url: _cache.cached_responses[url] for url in urls if url in _cache.cached_responses}
+
+
+def add_cached_responses(responses: dict):
+    _cache.cached_responses.update(responses)
+
+
+def prefetch_apps(apps: List[GleanApp], max_workers: int = DEFAULT_FETCH_CONCURRENCY):
+    """
+    Concurrently fetch all the probeinfo data needed to process `apps` (and
+    the libraries they depend on)
+    """
+    # the dependency listings determine which library endpoints we need, so
+    # they (and the library listing itself) have to come first
+    _cache.prefetch(
+        [GleanApp.LIBRARIES_URL]
+        + [GleanApp.DEPENDENCIES_URL_TEMPLATE.format(app.app["v1_name"]) for app in apps],
+        max_workers=max_workers,
+    )
+
+    urls = []
+    for app in apps:
+        urls.extend(app.get_probeinfo_urls())
+    _cache.prefetch(urls, max_workers=max_workers)
+
+
+# Fields of a definition whose values repeat across a great many metrics and
+# pings: we intern them, so only one copy of each is kept in memory
+INTERNED_DEFINITION_FIELDS = ("type", "lifetime", "expires", "origin")
+INTERNED_DEFINITION_LIST_FIELDS = ("notification_emails", "send_in_pings")
+
+
+def _intern_definition(definition: dict):
+    for key in INTERNED_DEFINITION_FIELDS:
+        if isinstance(definition.get(key), str):
+            definition[key] = sys.intern(definition[key])
+    for key in INTERNED_DEFINITION_LIST_FIELDS:
+        if isinstance(definition.get(key), list):
+            definition[key] = [
+                sys.intern(value) if isinstance(value, str) else value for value in definition[key]
+            ]
+    metadata = definition.get("metadata")
+    if isinstance(metadata, dict) and isinstance(metadata.get("tags"), list):
+        metadata["tags"] = [sys.intern(tag) for tag in metadata["tags"]]
+
+
+# the length of the dates probe scraper gives us (e.g. "2021-11-22 20:07:38")
+_PLAIN_ISO_DATETIME_LENGTHS = {19}
+
+
+def _get_date_range(dates: List[str]):
+    """
+    The earliest and latest of `dates` (ISO 8601 strings). Dates in probe
+    scraper's format sort as strings the same as the dates they represent, so
+    we only parse them if they're in some other format.
+    """
+    if set(map(len, dates)) == _PLAIN_ISO_DATETIME_LENGTHS and "T" not in "".join(dates):
+        return (min(dates), max(dates))
+    return (min(dates, key=datetime.fromisoformat), max(dates, key=datetime.fromisoformat))
+
+
 class GleanObject(object):
+    """
+    Base class of the objects defined by probe scraper. We hold a great many
+    of these at once, so they only keep their latest definition (along with
+    what we derive from their history) rather than their full history.
+    """
+
+    __slots__ = ()
+
     NAME_KEY = "name"
     ORIGIN_KEY = "origin"
     HISTORY_KEY = "history"
@@ -70,6 +212,17 @@ class GleanMetric(GleanObject):
     Represents an individual Glean metric, as defined by probe scraper
     """
 
+    __slots__ = (
+        "identifier",
+        "definition",
+        "description",
+        "tags",
+        "bq_prefix",
+        # (as ISO 8601 strings, parsed when asked for)
+        "_first_added",
+        "_last_change",
+    )
+
     ALL_PINGS_KEYWORDS = ("all-pings", "all_pings", "glean_client_info", "glean_internal_info")
 
     def __init__(self, identifier: str, definition: dict, *, ping_names: List[str] = None):
@@ -88,29 +241,49 @@ class GleanMetric(GleanObject):
         if ping_names is not None:
             self._update_all_pings(ping_names)
 
+    def for_pings(self, ping_names: List[str]) -> GleanMetric:
+        """
+        This metric as sent by an app with the given pings, with `all-pings`
+        (and the like) expanded to them. Only the top level of the definition
+        is copied, the rest is shared with this metric.
+        """
+        metric = object.__new__(type(self))
+        for slot in self.__slots__:
+            setattr(metric, slot, getattr(self, slot))
+        metric.definition = dict(self.definition)
+        metric._update_all_pings(ping_names)
+        return metric
+
     def _update_all_pings(self, pings: List[str]):
         if any([kw in self.definition["send_in_pings"] for kw in self.ALL_PINGS_KEYWORDS]):
             self.definition["send_in_pings"] = set(pings)
 
     def _set_definition(self, full_defn: dict):
-        # sort from latest to earliest
-        self.definition_history = list(full_defn[self.HISTORY_KEY])
+        definition_history = full_defn[self.HISTORY_KEY]
 
         # The canonical definition for up-to-date schemas
-        self.definition = self.definition_history[-1]
+        self.definition = definition_history[-1]
         self.definition["name"] = full_defn[self.NAME_KEY]
         self.definition["origin"] = full_defn[self.ORIGIN_KEY]
         self.definition["in_source"] = full_defn[self.IN_SOURCE_KEY]
         self.definition["sampling_info"] = full_defn.get(self.SAMPLING_INFO_KEY)
 
         # first seen is the earliest date in the history
-        self.definition["date_first_seen"] = self.definition_history[0]["dates"]["first"]
+        self.definition["date_first_seen"] = definition_history[0]["dates"]["first"]
+        _intern_definition(self.definition)
 
     def _set_dates(self, definition: dict):
-        vals = [datetime.fromisoformat(d["dates"]["first"]) for d in definition[self.HISTORY_KEY]]
+        (self._first_added, self._last_change) = _get_date_range(
+            [d["dates"]["first"] for d in definition[self.HISTORY_KEY]]
+        )
 
-        self.first_added = min(vals)
-        self.last_change = max(vals)
+    @property
+    def first_added(self) -> datetime:
+        return datetime.fromisoformat(self._first_added)
+
+    @property
+    def last_change(self) -> datetime:
+        return datetime.fromisoformat(self._last_change)
 
     def get_first_added(self) -> datetime:
         return self.first_added
@@ -124,6 +297,8 @@ class GleanPing(GleanObject):
     Represents an individual Glean Ping, as defined by probe scraper
     """
 
+    __slots__ = ("identifier", "definition", "description", "tags")
+
     def __init__(self, identifier: str, definition: dict):
         self.identifier = identifier
         self._set_definition(definition)
@@ -132,14 +307,15 @@ class GleanPing(GleanObject):
         self.tags = self.definition["metadata"].get("tags", [])
 
     def _set_definition(self, full_defn: dict):
-        self.definition_history = list(full_defn[self.HISTORY_KEY])
+        definition_history = full_defn[self.HISTORY_KEY]
 
         # The canonical definition for up-to-date schemas
-        self.definition = self.definition_history[-1]
+        self.definition = definition_history[-1]
         self.definition["name"] = full_defn[self.NAME_KEY]
         self.definition["origin"] = full_defn[self.ORIGIN_KEY]
-        self.definition["date_first_seen"] = self.definition_history[0]["dates"]["first"]
+        self.definition["date_first_seen"] = definition_history[0]["dates"]["first"]
         self.definition["in_source"] = full_defn[self.IN_SOURCE_KEY]
+        _intern_definition(self.definition)
 
 
 class GleanTag(GleanObject):
@@ -147,18 +323,20 @@ class GleanTag(GleanObject):
     Represents an individual Glean Tag, as defined by probe scraper
     """
 
+    __slots__ = ("identifier", "definition", "description")
+
     def __init__(self, identifier: str, definition: dict):
         self.identifier = identifier
         self._set_definition(definition)
-        self.description = self.definition_history[-1].get("description")
+        self.description = self.definition.get("description")
 
     def _set_definition(self, full_defn: dict):
-        self.definition_history = list(full_defn[self.HISTORY_KEY])
+        definition_history = full_defn[self.HISTORY_KEY]
 
         # The canonical definition for up-to-date schemas
-        self.definition = self.definition_history[-1]
+        self.definition = definition_history[-1]
         self.definition["name"] = full_defn[self.NAME_KEY]
-        self.definition["date_first_seen"] = self.definition_history[0]["dates"]["first"]
+        self.definition["date_first_seen"] = definition_history[0]["dates"]["first"]
 
 
 class GleanApp(object):
@@ -182,6 +360,17 @@ class GleanApp(object):
         self.app = app
         self.app_name = app["app_name"]
         self.app_id = app["app_id"]
+        # worked out when first needed (see `invalidate`)
+        self._dependencies = None
+        self._ping_data = None
+
+    def invalidate(self):
+        """
+        Forget this app's resolved dependencies and pings, so that they're
+        worked out again (from the probeinfo data) when next needed
+        """
+        self._dependencies = None
+        self._ping_data = None
 
     @staticmethod
     def get_apps() -> List[GleanApp]:
@@ -197,6 +386,11 @@ class GleanApp(object):
         return _cache.get_json(GleanApp.LIBRARIES_URL)
 
     def get_dependencies(self):
+        if self._dependencies is None:
+            self._dependencies = self._resolve_dependencies()
+        return self._dependencies
+
+    def _resolve_dependencies(self):
         # Get all of the library dependencies for the application that
         # are also known about in the repositories file.
 
@@ -212,9 +406,7 @@ class GleanApp(object):
 
         dependency_library_names = list(dependencies.keys())
 
-        libraries_by_dependency_name = {}
-        for library in self.get_libraries():
-            libraries_by_dependency_name[library["dependency_name"]] = library
+        libraries_by_dependency_name = _cache.libraries.get_libraries_by_dependency_name()
 
         dependencies = []
         for name in dependency_library_names:
@@ -228,43 +420,55 @@ class GleanApp(object):
         logging.info(f"For {self.app_id}, found Glean dependencies: {dependencies}")
         return dependencies
 
+    def get_probeinfo_urls(self) -> List[str]:
+        """
+        Get the probeinfo URLs this application's metrics, pings and tags are
+        built from (including those of its library dependencies)
+        """
+        v1_names = [self.app["v1_name"]] + [
+            dependency["v1_name"]
+            for dependency in self.get_dependencies()
+            if "v1_name" in dependency
+        ]
+        urls = [
+            template.format(v1_name)
+            for v1_name in v1_names
+            for template in (self.METRICS_URL_TEMPLATE, self.PING_URL_TEMPLATE)
+        ]
+        urls.append(self.TAGS_URL_TEMPLATE.format(self.app["v1_name"]))
+        return urls
+
     def get_metrics(self) -> List[GleanMetric]:
         data = _cache.get_json(GleanApp.METRICS_URL_TEMPLATE.format(self.app["v1_name"]))
         metrics = [
-            (key, {**metricdict, "origin": self.app["app_name"]})
+            GleanMetric(key, {**metricdict, "origin": self.app["app_name"]})
             for key, metricdict in data.items()
         ]
         for dependency in self.get_dependencies():
             if "v1_name" in dependency:
-                dependency_metrics = _cache.get_json(
-                    GleanApp.METRICS_URL_TEMPLATE.format(dependency["v1_name"])
-                )
-                # augment these dependency names with the library_name where they came from
-                metrics += [
-                    (d[0], {**d[1], "origin": dependency["library_name"]})
-                    for d in dependency_metrics.items()
-                ]
+                # (with the library_name they came from as their origin)
+                metrics += _cache.libraries.get_metrics(dependency)
 
         ping_names = set(self._get_ping_data().keys())
-        processed = []
 
         # deduplicate metrics
         metric_map = {}
         for metric in metrics:
             if (
-                not metric_map.get(metric[0])
-                or metric_map[metric[0]][1]["history"][-1]["dates"]["last"]
-                < metric[1]["history"][-1]["dates"]["last"]
+                not metric_map.get(metric.identifier)
+                or metric_map[metric.identifier].definition["dates"]["last"]
+                < metric.definition["dates"]["last"]
             ):
-                metric_map[metric[0]] = metric
-
-        for _id, defn in metric_map.values():
-            metric = GleanMetric(_id, defn, ping_names=ping_names)
-            processed.append(metric)
+                metric_map[metric.identifier] = metric
 
-        return processed
+        return [metric.for_pings(ping_names) for metric in metric_map.values()]
 
     def _get_ping_data(self) -> dict:
+        if self._ping_data is None:
+            self._ping_data = self._merge_ping_data()
+        return self._ping_data
+
+    def _merge_ping_data(self) -> dict:
         ping_data = dict()
 
         for p in _cache.get_json(GleanApp.PING_URL_TEMPLATE.format(self.app["v1_name"])).items():
@@ -272,12 +476,8 @@ class GleanApp(object):
 
         for dependency in self.get_dependencies():
             if "v1_name" in dependency:
-                for p in _cache.get_json(
-                    GleanApp.PING_URL_TEMPLATE.format(dependency["v1_name"])
-                ).items():
-                    _merge_latest_ping(
-                        ping_data, p[0], {**p[1], "origin": dependency["library_name"]}
-                    )
+                for p in _cache.libraries.get_ping_data(dependency).items():
+                    _merge_latest_ping(ping_data, p[0], p[1])
 
         return ping_data
 
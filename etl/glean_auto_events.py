@@ -1,29 +1,27 @@
 import logging
-import requests
-import copy
+from concurrent.futures import ThreadPoolExecutor
+
+from . import http_cache
+from .glean import DEFAULT_FETCH_CONCURRENCY
 
 logger = logging.getLogger(__name__)
 
+AUTO_EVENTS_FILE_LIST_URL = "https://public-data.telemetry.mozilla.org/api/v1/tables/glean_auto_events_derived/apps_auto_events_metadata/v1/files"  # noqa
+
 
-_auto_event_template = {
-    "name": "",
-    "type": "event",
-    "expiration": "never",
-    "description": "",
-    "event_info": {
-        "is_auto": True,
-        "auto_event_id": "",
-    },
-}
+def _get_auto_events_file(file):
+    logging.info(f"Extracting file: {file}")
+    resp = http_cache.get(file)
+    resp.raise_for_status()
+    return resp.json()
 
 
-def get_auto_events_names():
+def get_auto_events_names(max_workers=DEFAULT_FETCH_CONCURRENCY):
     """Get the automatic events names for the app"""
     data = []
-    file_list_endpoint = "https://public-data.telemetry.mozilla.org/api/v1/tables/glean_auto_events_derived/apps_auto_events_metadata/v1/files"
 
     # Mozilla's public-data API returns a list of files for a given dataset.
-    file_resp = requests.get(file_list_endpoint)
+    file_resp = http_cache.get(AUTO_EVENTS_FILE_LIST_URL)
     if file_resp.status_code == 404:
         logging.error("No data files found.")
         # Returns an empty list if no data files are found.
@@ -31,12 +29,20 @@ def get_auto_events_names():
     files = file_resp.json()
     if not files:
         raise ValueError("No data files found.")
-    for _, file in enumerate(files):
-        logging.info(f"Extracting file: {file}")
-        data.extend(requests.get(file).json())
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for rows in executor.map(_get_auto_events_file, files):
+            data.extend(rows)
     return data
 
 
+def index_auto_events_by_app(auto_events):
+    """Group the automatic events rows by the app they belong to"""
+    index = {}
+    for row in auto_events:
+        index.setdefault(row["app"], []).append(row)
+    return index
+
+
 def get_auto_events_for_app(app, auto_events):
     """Get the automatic events for the app"""
     event_names = [event for event in auto_events if event["app"] == app]
@@ -46,18 +52,25 @@ def get_auto_events_for_app(app, auto_events):
         if not event_name:
             continue
         auto_event_id = event_name.split(".")[-1]
-        event_template = copy.deepcopy(_auto_event_template)
-        event_template["name"] = event_name
-        auto_event_type_prefix = event_template["name"].split(".")[1]
+        auto_event_type_prefix = event_name.split(".")[1]
+        description = ""
         if auto_event_type_prefix.startswith("element_click"):
-            event_template["description"] = (
+            description = (
                 f"An event triggered whenever the {auto_event_id} element is clicked on a page."
             )
         elif auto_event_type_prefix.startswith("page_load"):
             page_name = auto_event_type_prefix.split("/")[1][:-1]
-            event_template["description"] = (
-                f"An event triggered whenever the page /{page_name} is loaded."
-            )
-        event_template["event_info"]["auto_event_id"] = auto_event_id
-        auto_events.append(event_template)
+            description = f"An event triggered whenever the page /{page_name} is loaded."
+        auto_events.append(
+            {
+                "name": event_name,
+                "type": "event",
+                "expiration": "never",
+                "description": description,
+                "event_info": {
+                    "is_auto": True,
+                    "auto_event_id": auto_event_id,
+                },
+            }
+        )
     return auto_events
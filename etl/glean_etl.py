@@ -1,28 +1,49 @@
-import re
-import copy
+import hashlib
 import json
 import logging
 import os
-import shutil
-import tempfile
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 import git
-import requests
-import stringcase
 import yaml
 
+from . import fetch, http_cache
 from .bigquery import get_bigquery_column_name, get_bigquery_ping_table_name
-from .expiry import get_expiry_text, get_mapped_expiry
+from .expiry import ReleaseCatalog, get_expiry_text, get_mapped_expiry
 from .glam import GLAM_METRICS_BLOCKLIST, SUPPORTED_GLAM_METRIC_TYPES, get_glam_metadata_for_metric
-from .glean import GleanApp
-from .glean_auto_events import get_auto_events_for_app, get_auto_events_names
+from .glean import (
+    DEFAULT_FETCH_CONCURRENCY,
+    GleanApp,
+    add_cached_responses,
+    get_cached_responses,
+    prefetch_apps,
+)
+from .glean_auto_events import (
+    get_auto_events_for_app,
+    get_auto_events_names,
+    index_auto_events_by_app,
+)
+from .identifiers import normalize_metric_names, snakecase
 from .looker import (
+    LookerExplores,
     get_looker_explores_for_metric,
     get_looker_explores_for_ping,
     get_looker_monitoring_metadata_for_event,
 )
-from .search import create_metrics_search_js
-from .utils import dump_json, get_event_name_and_category
+from .manifest import (
+    DEFAULT_MANIFEST_DIR,
+    LEGACY_MANIFEST_NAME,
+    BuildManifest,
+    fingerprint,
+    get_directory_fingerprint,
+    get_manifest_path,
+    get_source_fingerprint,
+)
+from .output import DEFAULT_WRITER_THREADS, OutputWriter
+from .search import GLEAN_SEARCH_KEYS, create_metrics_search_js
+from .utils import dump_json_bytes, get_event_name_and_category
 
 # Various additional sources of metadata
 ANNOTATIONS_URL = os.getenv(
@@ -41,15 +62,26 @@ EXPERIMENT_DATA_URL = os.getenv(
 )
 EXPERIMENTER_URL_TEMPLATE = "https://experimenter.services.mozilla.com/nimbus/{}/summary"
 
+MPS_URL = "https://github.com/mozilla-services/mozilla-pipeline-schemas"
+MPS_BRANCH = "generated-schemas"
+# Persistent (sparse) checkout of mozilla-pipeline-schemas, reused between builds
+MPS_CHECKOUT_DIR = os.getenv(
+    "MPS_CHECKOUT_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "glean-dictionary", "mozilla-pipeline-schemas"),
+)
+
 # Priority for getting metric data (use the later definitions of nightly over release)
 METRIC_CHANNEL_PRIORITY = {"nightly": 1, "beta": 2, "release": 3, "esr": 4}
 # Priority for sorting app ids in the UI (of anticipated relevance to the suer)
 USER_CHANNEL_PRIORITY = {"release": 1, "beta": 2, "nightly": 3, "esr": 4}
 
-# Certain words are blocked by uBlock Origin, so we need to map them to something else
-# to avoid the page being blocked
-# See: https://github.com/mozilla/glean-dictionary/issues/1682
-UBLOCK_ORIGIN_PRIVACY_FILTER = {"ad_impression": "advert_impression"}
+# Events that are expanded into a metric per automatically instrumented
+# element/page (see `extract_auto_event`)
+AUTO_EVENT_NAMES = ("glean.element_click", "glean.page_load")
+
+# Search indexes in the functions directory which aren't for an app group
+SEARCH_INDEX_FILENAME_PAT = re.compile(r"metrics_search_(.+)\.js")
+NON_APP_SEARCH_INDEXES = {"fog", "firefox_legacy", "fog_and_legacy"}
 
 # Handle these apps as having no external dependencies.
 # This marks all metrics coming from an external dependency as `in-source=false`.
@@ -63,47 +95,50 @@ UBLOCK_ORIGIN_PRIVACY_FILTER = {"ad_impression": "advert_impression"}
 APPS_DEPENDENCIES_REMOVED = ["focus_ios", "klar_ios", "focus_android", "klar_android"]
 
 
-def _clone_mps():
-    repo_path = tempfile.mkdtemp(suffix="_mps")
-    git.Repo.clone_from(
-        "https://github.com/mozilla-services/mozilla-pipeline-schemas",
-        repo_path,
-        bare=False,
-        branch="generated-schemas",
-        depth=1,
-    )
+def _checkout_mps(repo_path, namespaces, url=MPS_URL):
+    """
+    Create or update a sparse, shallow checkout of the generated schemas in
+    mozilla-pipeline-schemas at `repo_path`, limited to the schemas for
+    `namespaces`. The checkout is kept between builds so that only new
+    commits (and only the files we actually need) are downloaded.
+    """
+    if os.path.exists(os.path.join(repo_path, ".git")):
+        repo = git.Repo(repo_path)
+    else:
+        os.makedirs(repo_path, exist_ok=True)
+        repo = git.Repo.init(repo_path)
+        repo.create_remote("origin", url)
+
+    repo.git.sparse_checkout("set", "--cone", *[f"schemas/{ns}" for ns in sorted(namespaces)])
+    repo.git.fetch("--depth=1", "--filter=blob:none", "origin", MPS_BRANCH)
+    repo.git.checkout("--force", "-B", MPS_BRANCH, "FETCH_HEAD")
     return repo_path
 
 
-def _remove_mps_path(path):
-    shutil.rmtree(path)
-
+def _pipeline_schema(schema_repo_path, bq_path, snapshot=None):
+    schema_path = os.path.join("schemas", bq_path)
+    with open(os.path.join(schema_repo_path, schema_path), "rb") as fp:
+        content = fp.read()
+    if snapshot is not None:
+        snapshot.add_file(schema_path, content)
+    return json.loads(content)
 
-def _pipeline_schema(schema_repo_path, bq_path):
-    full_path = os.path.join(schema_repo_path, "schemas", bq_path)
-    with open(full_path, "r") as fp:
-        return json.load(fp)
 
-
-def _normalize_metrics(name):
-    # replace ., [, ], / with _ so sirv doesn't think that a metric is a file
-    # or directory
-    metric_name = re.sub(r"[.\[\]/]", "_", name)
-    for key, value in UBLOCK_ORIGIN_PRIVACY_FILTER.items():
-        if key in metric_name:
-            metric_name = metric_name.replace(key, value)
-
-    # if a metric name starts with "metrics", uBlock Origin
-    # will block the network call to get the JSON resource
-    # See: https://github.com/mozilla/glean-dictionary/issues/550
-    # To get around this, we add "data" to metric names
-    return f"data_{metric_name}"
+def _write_pipeline_schema(output, schema_dir, schema):
+    """
+    Write out a BigQuery schema to the content-addressed schema store (many
+    tables share exactly the same schema), returning the hash it's stored under
+    """
+    serialized = dump_json_bytes(schema)
+    schema_hash = hashlib.sha256(serialized).hexdigest()[:16]
+    output.write(os.path.join(schema_dir, f"{schema_hash}.json"), serialized)
+    return schema_hash
 
 
 def _resolve_metric_collision(existing, candidate):
     """
     Pick a winner when two metrics normalize to the same filename (see
-    `_normalize_metrics`).
+    `normalize_metric_name`).
     """
 
     def sort_key(metric):
@@ -159,6 +194,113 @@ def _incorporate_annotation(item, item_annotation, app=False, full=False):
     return incorporated
 
 
+class _MetricFileWriter:
+    """
+    Writes out the full definition of each of an app's metrics (one file per
+    metric) as soon as it's complete, keeping only the summary of it which
+    goes into the search index.
+
+    Metrics whose names normalize to the same filename wait for each other,
+    so that we can pick which one to write (see `_resolve_metric_collision`),
+    and the automatically instrumented events wait for their base events.
+    """
+
+    def __init__(self, output, app_name, app_metrics_dir, metric_names, auto_events_for_app):
+        """
+        `metric_names` are the names of all the metrics which will be
+        completed (in the order they were first seen)
+        """
+        self.output = output
+        self.app_name = app_name
+        self.app_metrics_dir = app_metrics_dir
+
+        # the base events we derive the automatic events from (if there's more
+        # than one, the last of them wins)
+        self.auto_event_bases = [name for name in AUTO_EVENT_NAMES if name in metric_names]
+        self.auto_events_for_app = auto_events_for_app if self.auto_event_bases else []
+        self._completed_auto_event_bases = {}
+
+        # any metric with the same name as an automatic event is replaced by it
+        all_metric_names = dict.fromkeys(metric_names)
+        all_metric_names.update(dict.fromkeys(e["name"] for e in self.auto_events_for_app))
+        self._positions = {name: i for (i, name) in enumerate(all_metric_names)}
+        self._replaced = {e["name"] for e in self.auto_events_for_app}
+        self._filenames = {
+            name: f"{normalized_name}.json"
+            for (name, normalized_name) in normalize_metric_names(all_metric_names).items()
+        }
+        # for each filename: how many of its metrics we're still waiting for,
+        # and those which are complete
+        self._pending_counts = Counter(self._filenames.values())
+        self._completed = defaultdict(list)
+        self._search_summaries = all_metric_names
+
+    def complete(self, name, metric_data):
+        """
+        Finish off the metric `name`, once we've added every variant of it
+        """
+        # resort the app-specific parts in user preference order
+        metric_data["variants"].sort(key=lambda v: USER_CHANNEL_PRIORITY[v["channel"]])
+        if name in self.auto_event_bases:
+            self._completed_auto_event_bases[name] = metric_data
+            if len(self._completed_auto_event_bases) == len(self.auto_event_bases):
+                self._complete_auto_events()
+        if name not in self._replaced:
+            self._add(name, metric_data)
+
+    def _complete_auto_events(self):
+        auto_events = {}
+        for base_name in self.auto_event_bases:
+            for auto_event in get_auto_event_definitions(
+                self._completed_auto_event_bases[base_name], self.auto_events_for_app
+            ):
+                auto_events[auto_event["name"]] = auto_event
+        self._completed_auto_event_bases = {}
+        for name, metric_data in auto_events.items():
+            self._add(name, metric_data)
+
+    def _add(self, name, metric_data):
+        self._search_summaries[name] = {
+            key: metric_data[key] for key in ["name", *GLEAN_SEARCH_KEYS]
+        }
+        filename = self._filenames[name]
+        self._completed[filename].append((self._positions[name], metric_data))
+        self._pending_counts[filename] -= 1
+        if not self._pending_counts[filename]:
+            self._write(filename, [data for (_, data) in sorted(self._completed.pop(filename))])
+
+    def _write(self, filename, candidates):
+        metric_data = candidates[0]
+        for candidate in candidates[1:]:
+            # Resolve metric name collision.
+            winner, loser = _resolve_metric_collision(metric_data, candidate)
+            logging.warning(
+                "Metric name collision for app %s: %r and %r both normalize to %s. "
+                "Keeping %r (in_source=%s); dropping %r (in_source=%s). "
+                "The dropped metric will not have its own page in the Glean "
+                "Dictionary or any consumer of its data (e.g. GLAM).",
+                self.app_name,
+                metric_data["name"],
+                candidate["name"],
+                filename,
+                winner["name"],
+                winner.get("in_source"),
+                loser["name"],
+                loser.get("in_source"),
+            )
+            metric_data = winner
+        self.output.write(
+            os.path.join(self.app_metrics_dir, filename), dump_json_bytes(metric_data)
+        )
+
+    def get_search_summaries(self):
+        """
+        The summaries of every metric for the search index, once all of them
+        have been completed
+        """
+        return list(self._search_summaries.values())
+
+
 def _expand_tags(item, tag_descriptions):
     """
     Expand the tags into full name/description objects (for full definitions)
@@ -248,24 +390,681 @@ def _is_metric_in_ping(metric, ping_data):
     return True
 
 
-def write_glean_metadata(output_dir, functions_dir, app_names=None):
+class _BuildContext:
+    """
+    Inputs shared by every app group in a build
+    """
+
+    def __init__(
+        self,
+        output_dir,
+        functions_dir,
+        *,
+        annotations_index,
+        looker_namespaces,
+        product_details,
+        metrics_sampling_info,
+        mps_repo_path,
+        fetch_concurrency=DEFAULT_FETCH_CONCURRENCY,
+        snapshot=None,
+        stream_metrics=False,
+    ):
+        self.output_dir = output_dir
+        self.functions_dir = functions_dir
+        self.annotations_index = annotations_index
+        self.looker_namespaces = looker_namespaces
+        # the base explores for each app variant and ping are shared by all
+        # the metrics in them
+        self.looker_explores = LookerExplores(looker_namespaces)
+        self.product_details = product_details
+        # for mapping expiry versions (shared by all the metrics we process)
+        self.release_catalog = ReleaseCatalog(product_details)
+        self.latest_fx_release_version = self.release_catalog.latest_release_version
+        self.metrics_sampling_info = metrics_sampling_info
+        self.mps_repo_path = mps_repo_path
+        self.fetch_concurrency = fetch_concurrency
+        self.snapshot = snapshot
+        # write out each metric as soon as we're done with it, rather than
+        # holding on to every metric of an app until the end
+        self.stream_metrics = stream_metrics
+
+        # BigQuery schemas are written once each to a shared store, and
+        # referenced from the table files by hash
+        self.schema_dir = os.path.join(output_dir, "schemas")
+        os.makedirs(self.schema_dir, exist_ok=True)
+        self.schema_hashes = {}
+
+        self._auto_events_index = None
+
+    def get_auto_events_index(self):
+        # the automatic events dataset covers every app, so we only load it
+        # (once) if an app actually has automatic events
+        if self._auto_events_index is None:
+            self._auto_events_index = index_auto_events_by_app(
+                get_auto_events_names(max_workers=self.fetch_concurrency)
+            )
+        return self._auto_events_index
+
+
+def _write_app_group(context, app_name, app_group, apps):
+    """
+    Writes out all the metadata for a group of apps (the variants of an
+    application). Returns its summary for the list of apps, the hashes of the
+    schemas its tables reference and the counts of files written/skipped/deleted.
+    """
+    # files are written out in the background while we work out the next ones
+    with OutputWriter(threads=DEFAULT_WRITER_THREADS) as output:
+        (app_summary, schema_hashes) = _write_app_group_files(
+            context, output, app_name, app_group, apps
+        )
+        output.flush()
+    return (app_summary, schema_hashes, output.counts)
+
+
+def _write_app_group_files(context, output, app_name, app_group, apps):
+    group_schema_hashes = set()
+
+    app_dir = os.path.join(context.output_dir, app_name)
+    (app_id_dir, app_ping_dir, app_table_dir, app_metrics_dir) = (
+        os.path.join(app_dir, subtype) for subtype in ("app_ids", "pings", "tables", "metrics")
+    )
+    for directory in (app_id_dir, app_ping_dir, app_table_dir, app_metrics_dir):
+        os.makedirs(directory, exist_ok=True)
+
+    app_annotation = _get_annotation(context.annotations_index, app_name, "app")
+
+    # Create a summary (used in the top-level list of apps, and base metadata for the
+    # app detail page)
+    app_summary = _incorporate_annotation(app_group, app_annotation.get("app", {}), app=True)
+
+    if app_summary.get("logo"):
+        # want the original URL for getting the logo
+        output.write(
+            os.path.join(app_dir, _get_logo_filename(app_summary["logo"])),
+            http_cache.get(app_annotation["app"]["logo"]).content,
+        )
+
+    # An application group is considered a prototype only if all its application ids are
+    if all([app_id.get("prototype") for app_id in app_group["app_ids"]]):
+        app_summary["prototype"] = True
+
+    # Now get more detail on the application for the detail page and all the metrics
+    app_data = dict(app_summary, pings=[], metrics=[])
+    app_tags_for_objects = app_annotation.get(
+        "tags", {}
+    )  # tags for objects in the app (e.g. metrics)
+    app_tags_for_app = app_summary.get("app_tags", [])  # tags for the app itself
+
+    app_metrics = {}
+    # summaries of the metrics sent in each ping (in the order we saw them)
+    metrics_by_ping = defaultdict(list)
+    # keep track of which metric identifiers we have seen so far
+    metric_identifiers_seen = set()
+    # the ping data for each ping identifier we have seen so far
+    app_pings = {}
+
+    # (if an app id appears more than once, use the first app for it)
+    apps_by_id = {app.app_id: app for app in reversed(apps)}
+    app_ids = [app["name"] for app in app_group["app_ids"]]
+
+    def get_auto_events(metric_names):
+        if not any(name in metric_names for name in AUTO_EVENT_NAMES):
+            return []
+        return get_auto_events_for_app(app_name, context.get_auto_events_index().get(app_name, []))
+
+    # for each app variant: the app, the pings it sends with the client id and
+    # the descriptions of the tags we knew of by then
+    variants = []
+    for app_id in app_ids:
+        app = apps_by_id[app_id]
+        app_is_deprecated = app.app.get("deprecated")
+
+        # app-id tags: tags specified in the annotations (and or more recent versions of an app)
+        # will always override older ones
+        for tag in app.get_tags():
+            if not app_tags_for_objects.get(tag.identifier):
+                app_tags_for_objects[tag.identifier] = tag.description
+
+        # information about this app_id
+        output.write(
+            os.path.join(app_id_dir, f"{_get_resource_path(app_id)}.json"),
+            dump_json_bytes(dict(app.app, app_tags=app_tags_for_app)),
+        )
+
+        pings_with_client_id = set()
+        # ping data
+        for ping in app.get_pings():
+            if ping.identifier not in app_pings:
+                ping_data = _incorporate_annotation(
+                    dict(
+                        ping.definition,
+                        tags=ping.tags,
+                        variants=[],
+                    ),
+                    _get_annotation(
+                        context.annotations_index,
+                        ping.definition["origin"],
+                        "pings",
+                        ping.identifier,
+                    ),
+                )
+                # Force all outside pings as removed.
+                if app_name in APPS_DEPENDENCIES_REMOVED:
+                    if ping_data["origin"] != app_name:
+                        ping_data.update({"in_source": False})
+
+                app_data["pings"].append(ping_data)
+                app_pings[ping.identifier] = ping_data
+
+            ping_data = app_pings[ping.identifier]
+
+            if ping_data["include_client_id"]:
+                pings_with_client_id.add(ping_data["name"])
+
+            # write table description (app variant specific)
+            ping_name_snakecase = snakecase(ping.identifier)
+            stable_ping_table_name = f"{app.app['bq_dataset_family']}.{ping_name_snakecase}"
+            live_ping_table_name = f"{app.app['bq_dataset_family']}_live.{ping_name_snakecase}_v1"
+            bq_path = f"{app.app['document_namespace']}/{ping.identifier}/{ping.identifier}.1.bq"
+            bq_definition = (
+                "https://github.com/mozilla-services/mozilla-pipeline-schemas/blob/generated-schemas/schemas/"  # noqa
+                + bq_path
+            )
+            if bq_path not in context.schema_hashes:
+                context.schema_hashes[bq_path] = _write_pipeline_schema(
+                    output,
+                    context.schema_dir,
+                    _pipeline_schema(context.mps_repo_path, bq_path, context.snapshot),
+                )
+            group_schema_hashes.add(context.schema_hashes[bq_path])
+            app_channel = app.app.get("app_channel")
+            variant_data = dict(
+                id=app_id,
+                description=_get_app_variant_description(app),
+                table=stable_ping_table_name,
+                channel=app_channel if app_channel else "release",
+            )
+            looker_explores = get_looker_explores_for_ping(
+                context.looker_explores, app, app_group, ping
+            )
+            if not app_is_deprecated and looker_explores:
+                variant_data.update({"looker_explores": looker_explores})
+            ping_data["variants"].append(variant_data)
+            app_variant_table_dir = os.path.join(app_table_dir, _get_resource_path(app.app_id))
+            os.makedirs(app_variant_table_dir, exist_ok=True)
+            output.write(
+                os.path.join(app_variant_table_dir, f"{ping.identifier}.json"),
+                dump_json_bytes(
+                    dict(
+                        bq_definition=bq_definition,
+                        bq_schema_hash=context.schema_hashes[bq_path],
+                        live_table=live_ping_table_name,
+                        name=ping.identifier,
+                        stable_table=stable_ping_table_name,
+                        app_id=app_id,
+                        canonical_app_name=app.app["canonical_app_name"],
+                        app_tags=app_tags_for_app,
+                    )
+                ),
+            )
+
+        variants.append((app, pings_with_client_id, dict(app_tags_for_objects)))
+
+    app_sampling_info = context.metrics_sampling_info.get(app_name)
+
+    def add_metric(app, pings_with_client_id, app_tags_for_objects, metric):
+        """
+        Add `metric`, as sent by the app variant `app`
+        """
+        if metric.identifier not in metric_identifiers_seen:
+            metric_identifiers_seen.add(metric.identifier)
+
+            # read the annotation, if any
+            metric_annotation = _get_annotation(
+                context.annotations_index,
+                metric.definition["origin"],
+                "metrics",
+                metric.identifier,
+            )
+
+            metric_sample_info: dict | None = (
+                dict(app_sampling_info.get(metric.identifier))
+                if app_sampling_info is not None
+                and app_sampling_info.get(metric.identifier) is not None
+                else None
+            )
+            is_sampled = metric_sample_info is not None
+
+            metric_sampled_text = None
+            if is_sampled:
+                for channel in metric_sample_info:
+                    sampled_text = (
+                        str(metric_sample_info.get(channel)["sample_size"] * 100) + "% " + "on"
+                        if metric.definition["disabled"] is True
+                        else str(metric_sample_info.get(channel)["sample_size"] * 100)
+                        + "% "
+                        + "off"
+                    )
+                    metric_sample_info.get(channel)["sampled_text"] = sampled_text
+
+                    # We prefer the release channel text, but if it's
+                    # not available, we use the first available
+                    if not metric_sampled_text:
+                        metric_sampled_text = sampled_text
+                    if channel == "release":
+                        metric_sampled_text = sampled_text
+
+            # Force all outside metrics as removed.
+            if app_name in APPS_DEPENDENCIES_REMOVED:
+                if metric.definition["origin"] != app_name:
+                    metric.definition.update({"in_source": False})
+            base_definition = _incorporate_annotation(
+                dict(
+                    name=metric.identifier,
+                    description=metric.description,
+                    tags=metric.tags,
+                    in_source=metric.definition["in_source"],
+                    latest_fx_release_version=context.latest_fx_release_version,
+                    extra_keys=metric.definition["extra_keys"]
+                    if "extra_keys" in metric.definition
+                    else None,
+                    type=metric.definition["type"],
+                    expires=get_mapped_expiry(
+                        metric.definition["expires"], app_name, context.release_catalog
+                    ),
+                    expiry_text=get_expiry_text(
+                        metric.definition["expires"], app_name, context.release_catalog
+                    ),
+                    sampled=is_sampled,
+                    sampled_text=metric_sampled_text if metric_sampled_text else "Not sampled",
+                    is_part_of_info_section=metric.bq_prefix in ["client_info", "ping_info"],
+                    bugs=metric.definition["bugs"],
+                    monitor=metric.definition.get("metadata", {}).get("monitor", {}),
+                    notification_emails=metric.definition["notification_emails"],
+                ),
+                metric_annotation,
+            )
+
+            if metric.definition["origin"] != app_name:
+                base_definition.update({"origin": metric.definition["origin"]})
+
+            # metrics with associated pings
+            metric_with_pings = dict(base_definition, pings=metric.definition["send_in_pings"])
+            # (a metric listing a ping more than once is only in it once)
+            for ping_name in dict.fromkeys(metric.definition["send_in_pings"]):
+                metrics_by_ping[ping_name].append(metric_with_pings)
+
+            # the summary of metrics
+            app_data["metrics"].append(base_definition)
+
+            # the full metric definition
+            app_metrics[metric.identifier] = _expand_tags(
+                _incorporate_annotation(
+                    dict(
+                        metric.definition,
+                        name=metric.identifier,
+                        tags=metric.tags,
+                        # convert send_in_pings to a list so we can sort (see below)
+                        send_in_pings=list(metric.definition["send_in_pings"]),
+                        repo_url=app.app["url"],
+                        variants=[],
+                        expires=base_definition["expires"],
+                        latest_fx_release_version=context.latest_fx_release_version,
+                        expiry_text=base_definition["expiry_text"],
+                        canonical_app_name=app.app["canonical_app_name"],
+                        app_tags=app_tags_for_app,
+                        sampling_info=metric_sample_info,
+                        monitor=base_definition["monitor"],
+                    ),
+                    metric_annotation,
+                    full=True,
+                ),
+                app_tags_for_objects,
+            )
+
+            if metric.definition["type"] == "event":
+                app_metrics[metric.identifier]["event_info"] = {
+                    "name": get_event_name_and_category(metric.identifier)[1],
+                    "category": get_event_name_and_category(metric.identifier)[0],
+                }
+
+            # sort "send in pings" alphanumerically, except that `metrics`
+            # should always be first if present and `deletion-request`
+            # should be last
+            ping_priority = {"metrics": 0, "deletion-request": 2}
+            app_metrics[metric.identifier]["send_in_pings"].sort()
+            app_metrics[metric.identifier]["send_in_pings"].sort(
+                key=lambda ping: ping_priority.get(ping, 1)
+            )
+
+        # BigQuery and Looker metadata is ping based
+        ping_data = {}
+        for ping_name in metric.definition["send_in_pings"]:
+            ping_data[ping_name] = {
+                "bigquery_table": get_bigquery_ping_table_name(
+                    app.app["bq_dataset_family"], ping_name
+                )
+            }
+            # FIXME: if we allow the metadata format to change, we can
+            # just set it up all in one go above
+            looker_explores = get_looker_explores_for_metric(
+                context.looker_explores,
+                app,
+                app_group,
+                metric,
+                ping_name,
+                ping_name in pings_with_client_id,
+            )
+            if looker_explores:
+                ping_data[ping_name].update({"looker_explores": looker_explores})
+            glam_metadata = get_glam_metadata_for_metric(app, metric, ping_name)
+            ping_data[ping_name].update(glam_metadata)
+
+            event_monitoring_metadata = get_looker_monitoring_metadata_for_event(
+                app, app_group, metric
+            )
+            if event_monitoring_metadata:
+                ping_data[ping_name].update({"event_monitoring": event_monitoring_metadata})
+
+        etl = dict(
+            ping_data=ping_data,
+            bigquery_column_name=get_bigquery_column_name(metric),
+        )
+
+        app_metrics[metric.identifier]["variants"].append(
+            dict(
+                id=app.app_id,
+                channel=app.app.get("app_channel", "release"),
+                description=_get_app_variant_description(app),
+                etl=etl,
+            )
+        )
+
+    # metrics data
+    metric_files = None
+    if context.stream_metrics:
+        # go through the metrics one at a time (across all the app variants
+        # sending each), so that we can write each out (and let go of it) as
+        # soon as it's complete
+        metrics_by_variant = [
+            {metric.identifier: metric for metric in variant_app.get_metrics()}
+            for (variant_app, _, _) in variants
+        ]
+        metric_names = list(
+            dict.fromkeys(name for metrics in metrics_by_variant for name in metrics)
+        )
+        metric_files = _MetricFileWriter(
+            output, app_name, app_metrics_dir, metric_names, get_auto_events(metric_names)
+        )
+        for metric_name in metric_names:
+            for variant, metrics in zip(variants, metrics_by_variant):
+                if metric_name in metrics:
+                    add_metric(*variant, metrics.pop(metric_name))
+            metric_files.complete(metric_name, app_metrics.pop(metric_name))
+    else:
+        for variant in variants:
+            for metric in variant[0].get_metrics():
+                add_metric(*variant, metric)
+
+    # write ping descriptions, resorting the app-specific parts in user preference order
+    for ping_data in app_data["pings"]:
+        ping_data["variants"].sort(key=lambda v: USER_CHANNEL_PRIORITY[v["channel"]])
+        output.write(
+            os.path.join(app_ping_dir, f"{ping_data['name']}.json"),
+            dump_json_bytes(
+                _expand_tags(
+                    _incorporate_annotation(
+                        dict(
+                            ping_data,
+                            metrics=[
+                                metric
+                                for metric in metrics_by_ping[ping_data["name"]]
+                                if _is_metric_in_ping(metric, ping_data)
+                            ],
+                            tag_descriptions=app_tags_for_objects,
+                            canonical_app_name=app.app["canonical_app_name"],
+                            app_tags=app_tags_for_app,
+                        ),
+                        _get_annotation(
+                            context.annotations_index,
+                            ping_data["origin"],
+                            "pings",
+                            ping_data["name"],
+                        ),
+                        full=True,
+                    ),
+                    app_tags_for_objects,
+                )
+            ),
+        )
+
+    # write metrics (unless they were streamed out above)
+    if metric_files is None:
+        metric_files = _MetricFileWriter(
+            output, app_name, app_metrics_dir, list(app_metrics), get_auto_events(app_metrics)
+        )
+    for metric_name in list(app_metrics):
+        metric_files.complete(metric_name, app_metrics.pop(metric_name))
+    for _ in metric_files.auto_event_bases:
+        app_data["metrics"].extend(metric_files.auto_events_for_app)
+
+    # write tag metadata (if any)
+    if app_tags_for_objects:
+        # the number of metrics with each tag
+        tag_metric_counts = Counter(
+            tag_name for metric in app_data["metrics"] for tag_name in set(metric.get("tags", []))
+        )
+        tags = [{"name": k, "description": v} for (k, v) in app_tags_for_objects.items()]
+        app_data["tags"] = tags
+        for tag in tags:
+            tag["metric_count"] = tag_metric_counts[tag["name"]]
+    else:
+        app_data["tags"] = []
+
+    # sort the information in the app-level summary, then write it out
+    # (we don't sort application id information, that's already handled
+    # above)
+    for key in ["tags", "metrics", "pings"]:
+        if app_data.get(key):
+            app_data[key].sort(key=lambda v: v["name"])
+            # for tags, put those with no metrics associated with them at the
+            # end
+            if key == "tags":
+                app_data[key].sort(key=lambda v: v["metric_count"] > 0, reverse=True)
+
+    output.write(
+        os.path.join(app_dir, "index.json"),
+        dump_json_bytes(
+            _incorporate_annotation(app_data, app_annotation.get("app", {}), app=True, full=True)
+        ),
+    )
+
+    # write a search index for the app
+    output.write(
+        os.path.join(context.functions_dir, f"metrics_search_{app_name}.js"),
+        create_metrics_search_js(metric_files.get_search_summaries(), app_name, legacy=False),
+    )
+
+    # export FOG data to a separate file for the FOG + legacy search index
+    if app_name == "firefox_desktop":
+        output.write(
+            os.path.join(context.functions_dir, "metrics_search_fog.js"),
+            create_metrics_search_js(
+                metric_files.get_search_summaries(), app_name="fog", legacy=False
+            ),
+        )
+
+    # anything else in the app's directory is left over from metrics, pings,
+    # etc. which no longer exist
+    output.remove_stale(app_dir)
+
+    return (app_summary, sorted(group_schema_hashes))
+
+
+def _get_app_group_urls(apps):
+    """
+    The probeinfo URLs the output for `apps` is built from
+    """
+    return [GleanApp.LIBRARIES_URL] + [
+        url
+        for app in apps
+        for url in [
+            GleanApp.DEPENDENCIES_URL_TEMPLATE.format(app.app["v1_name"]),
+            *app.get_probeinfo_urls(),
+        ]
+    ]
+
+
+def _remove_stale_app_groups(output, output_dir, functions_dir, app_groups):
+    """
+    Remove the output of any app group which no longer exists: its directory
+    (which we recognize by its index) and its search index
+    """
+    for name in sorted(os.listdir(output_dir)):
+        app_dir = os.path.join(output_dir, name)
+        if name not in app_groups and os.path.exists(os.path.join(app_dir, "index.json")):
+            output.remove_stale(app_dir)
+            os.rmdir(app_dir)
+    for filename in sorted(os.listdir(functions_dir)):
+        match = SEARCH_INDEX_FILENAME_PAT.fullmatch(filename)
+        if match and match.group(1) not in app_groups | NON_APP_SEARCH_INDEXES:
+            output.remove(os.path.join(functions_dir, filename))
+
+
+def _get_app_group_required_outputs(output_dir, functions_dir, app_name):
+    """
+    Files written by the build of an app group which must all still exist for
+    us to keep its last output
+    """
+    paths = [
+        os.path.join(output_dir, app_name, "index.json"),
+        os.path.join(functions_dir, f"metrics_search_{app_name}.js"),
+    ]
+    if app_name == "firefox_desktop":
+        paths.append(os.path.join(functions_dir, "metrics_search_fog.js"))
+    return paths
+
+
+def _get_app_group_fingerprint(context, base_fingerprint, app_name, app_group, apps):
+    """
+    Fingerprint of every input that affects the output for an app group (on
+    top of `base_fingerprint`, which covers the inputs shared by all of them)
+    """
+    responses = get_cached_responses(_get_app_group_urls(apps))
+    # metrics and pings from libraries are annotated under the library's name
+    origins = [app_name] + [library["library_name"] for library in GleanApp.get_libraries()]
+    # automatic events only affect the output if the group has one of their
+    # base metrics (and we only load them if so). This errs on the side of
+    # including them, e.g. if a base metric is only mentioned in a description.
+    metrics_urls = {
+        GleanApp.METRICS_URL_TEMPLATE.format(v1_name)
+        for app in apps
+        for v1_name in [app.app["v1_name"]]
+        + [dep["v1_name"] for dep in app.get_dependencies() if "v1_name" in dep]
+    }
+    has_auto_events = any(
+        f'"{name}"'.encode("utf-8") in resp.content
+        for (url, resp) in responses.items()
+        if url in metrics_urls
+        for name in AUTO_EVENT_NAMES
+    )
+    # the logo is copied from its URL, whose content can change
+    logo_url = (
+        _get_annotation(context.annotations_index, app_name, "app").get("app", {}).get("logo")
+    )
+    return fingerprint(
+        base_fingerprint,
+        app_group,
+        http_cache.get(logo_url).content if logo_url else None,
+        [app.app for app in apps],
+        *[
+            part
+            for (url, resp) in sorted(responses.items())
+            for part in (url, resp.status_code, resp.content)
+        ],
+        {origin: context.annotations_index.get(origin) for origin in origins},
+        context.looker_namespaces.get(app_name),
+        context.metrics_sampling_info.get(app_name),
+        context.get_auto_events_index().get(app_name, []) if has_auto_events else None,
+        *[
+            get_directory_fingerprint(
+                os.path.join(context.mps_repo_path, "schemas", app.app["document_namespace"])
+            )
+            for app in apps
+        ],
+    )
+
+
+# the build context for app groups written by this (worker) process
+_worker_context = None
+
+
+def _init_app_group_worker(context, cache):
+    global _worker_context
+    _worker_context = context
+    http_cache.set_http_cache(cache)
+    # (forked workers mustn't share the parent's keep-alive connections)
+    fetch.reset_session()
+
+
+def _write_app_group_in_worker(app_name, app_group, apps, responses):
+    add_cached_responses(responses)
+    return _write_app_group(_worker_context, app_name, app_group, apps)
+
+
+def write_glean_metadata(
+    output_dir,
+    functions_dir,
+    app_names=None,
+    fetch_concurrency=DEFAULT_FETCH_CONCURRENCY,
+    mps_path=None,
+    snapshot=None,
+    jobs=1,
+    force=False,
+    stream_metrics=False,
+    manifest_dir=DEFAULT_MANIFEST_DIR,
+):
     """
     Writes out the metadata for use by the dictionary
+
+    If `mps_path` is given, BigQuery schemas are read from that copy of
+    mozilla-pipeline-schemas (which must have the generated-schemas branch
+    checked out) instead of our own checkout. If `snapshot` is given, the
+    schema files we read are recorded into it.
+
+    With `jobs` > 1, app groups are written out in parallel by that many
+    worker processes.
+
+    App groups whose inputs haven't changed since the last build into
+    `output_dir` (as recorded in its manifest in `manifest_dir`) are skipped
+    (keeping their existing output), unless `force` is set or we're recording
+    a snapshot (which needs every input to be read).
+
+    With `stream_metrics`, each metric's file is written out as soon as every
+    app variant sending it has been processed, so that only summaries of an
+    app's metrics (rather than their full definitions) are held in memory.
+
+    Returns a report of how many files were written, skipped and deleted.
     """
-    # first, get the basic metadata from various sources
-    annotations_index = requests.get(ANNOTATIONS_URL).json()
-    looker_namespaces = yaml.safe_load(requests.get(NAMESPACES_URL).text)
-    product_details = requests.get(FIREFOX_PRODUCT_DETAIL_URL).json()
-    latest_fx_release_version = list(product_details)[-1]
-    metrics_sampling_info = _get_metric_sample_data(requests.get(EXPERIMENT_DATA_URL).json())
+    if jobs > 1 and snapshot is not None:
+        raise ValueError("Recording a snapshot is not supported with multiple jobs")
 
-    mps_repo_path = _clone_mps()
+    # first, get the basic metadata from various sources
+    annotations_index = http_cache.get(ANNOTATIONS_URL).json()
+    looker_namespaces = yaml.safe_load(http_cache.get(NAMESPACES_URL).text)
+    product_details = http_cache.get(FIREFOX_PRODUCT_DETAIL_URL).json()
+    metrics_sampling_info = _get_metric_sample_data(http_cache.get(EXPERIMENT_DATA_URL).json())
 
     # Then, get the apps we're using
     apps = [app for app in GleanApp.get_apps()]
     if app_names:
         apps = [app for app in apps if app.app_name in app_names]
 
+    mps_repo_path = mps_path or _checkout_mps(
+        MPS_CHECKOUT_DIR,
+        {app.app["document_namespace"] for app in apps if not app.app.get("skip_documentation")},
+    )
+
     app_groups = {}
     for app in apps:
         if app.app.get("skip_documentation"):
@@ -295,6 +1094,12 @@ def write_glean_metadata(output_dir, functions_dir, app_names=None):
             ]
         )
 
+    # fetch all the probeinfo data we're going to need up front, in parallel
+    prefetch_apps(
+        [app for app in apps if not app.app.get("skip_documentation")],
+        max_workers=fetch_concurrency,
+    )
+
     # sort each set of app ids by the following criteria
     # metric channel priority nightly < beta < release < esr
     # non-deprecated < deprecated
@@ -302,441 +1107,140 @@ def write_glean_metadata(output_dir, functions_dir, app_names=None):
         app_group["app_ids"].sort(key=lambda app_id: METRIC_CHANNEL_PRIORITY[app_id["channel"]])
         app_group["app_ids"].sort(key=lambda app_id: app_id["deprecated"])
 
-    # Process each grouping of apps into a set of summaries, app details, and all the rest
-    app_summaries = []
+    context = _BuildContext(
+        output_dir,
+        functions_dir,
+        annotations_index=annotations_index,
+        looker_namespaces=looker_namespaces,
+        product_details=product_details,
+        metrics_sampling_info=metrics_sampling_info,
+        mps_repo_path=mps_repo_path,
+        fetch_concurrency=fetch_concurrency,
+        snapshot=snapshot,
+        stream_metrics=stream_metrics,
+    )
+
+    # Skip any grouping of apps whose inputs are the same as in the last build
+    manifest_path = get_manifest_path(manifest_dir, output_dir)
+    manifest = BuildManifest.load(manifest_path)
+    skip_unchanged = not force and snapshot is None
+    # (the functions directory is where the search indexes go, relative to the
+    # output so that both can be moved together)
+    base_fingerprint = fingerprint(
+        get_source_fingerprint(), product_details, os.path.relpath(functions_dir, output_dir)
+    )
+    group_apps = {
+        app_name: [app for app in apps if app.app_name == app_name] for app_name in app_groups
+    }
+    group_fingerprints = {}
+    app_summaries = {}
     for app_name, app_group in app_groups.items():
-        app_dir = os.path.join(output_dir, app_name)
-        (app_id_dir, app_ping_dir, app_table_dir, app_metrics_dir) = (
-            os.path.join(app_dir, subtype) for subtype in ("app_ids", "pings", "tables", "metrics")
+        group_fingerprints[app_name] = _get_app_group_fingerprint(
+            context, base_fingerprint, app_name, app_group, group_apps[app_name]
         )
-        for directory in (app_id_dir, app_ping_dir, app_table_dir, app_metrics_dir):
-            os.makedirs(directory, exist_ok=True)
-
-        app_annotation = _get_annotation(annotations_index, app_name, "app")
-
-        # Create a summary (used in the top-level list of apps, and base metadata for the
-        # app detail page)
-        app_summary = _incorporate_annotation(app_group, app_annotation.get("app", {}), app=True)
-
-        if app_summary.get("logo"):
-            with open(os.path.join(app_dir, _get_logo_filename(app_summary["logo"])), "wb") as f:
-                # want the original URL for getting the logo
-                f.write(requests.get(app_annotation["app"]["logo"]).content)
-
-        # An application group is considered a prototype only if all its application ids are
-        if all([app_id.get("prototype") for app_id in app_group["app_ids"]]):
-            app_summary["prototype"] = True
-
-        # add the summary application to the app list
-        app_summaries.append(app_summary)
-
-        # Now get more detail on the application for the detail page and all the metrics
-        app_data = dict(app_summary, pings=[], metrics=[])
-        app_tags_for_objects = app_annotation.get(
-            "tags", {}
-        )  # tags for objects in the app (e.g. metrics)
-        app_tags_for_app = app_summary.get("app_tags", [])  # tags for the app itself
-
-        app_metrics = {}
-        metric_pings = dict(data=[])
-        # keep track of which metric and ping identifiers we have seen so far
-        metric_identifiers_seen = set()
-        ping_identifiers_seen = set()
-
-        for app_id in [app["name"] for app in app_group["app_ids"]]:
-            app = next(app for app in apps if app.app_id == app_id)
-            app_is_deprecated = app.app.get("deprecated")
-
-            # app-id tags: tags specified in the annotations (and or more recent versions of an app)
-            # will always override older ones
-            for tag in app.get_tags():
-                if not app_tags_for_objects.get(tag.identifier):
-                    app_tags_for_objects[tag.identifier] = tag.description
-
-            # information about this app_id
-            open(os.path.join(app_id_dir, f"{_get_resource_path(app_id)}.json"), "w").write(
-                dump_json(dict(app.app, app_tags=app_tags_for_app))
+        if (
+            skip_unchanged
+            and manifest.is_current(app_name, group_fingerprints[app_name])
+            and all(
+                os.path.exists(path)
+                for path in _get_app_group_required_outputs(output_dir, functions_dir, app_name)
             )
+        ):
+            logging.info(f"Inputs for {app_name} are unchanged, keeping existing output")
+            app_summaries[app_name] = manifest.get_app_summary(app_name)
+    pending_app_groups = {
+        app_name: app_group
+        for (app_name, app_group) in app_groups.items()
+        if app_name not in app_summaries
+    }
 
-            pings_with_client_id = set()
-            # ping data
-            for ping in app.get_pings():
-                if ping.identifier not in ping_identifiers_seen:
-                    ping_identifiers_seen.add(ping.identifier)
-                    ping_data = _incorporate_annotation(
-                        dict(
-                            ping.definition,
-                            tags=ping.tags,
-                            variants=[],
-                        ),
-                        _get_annotation(
-                            annotations_index,
-                            ping.definition["origin"],
-                            "pings",
-                            ping.identifier,
-                        ),
-                    )
-                    # Force all outside pings as removed.
-                    if app_name in APPS_DEPENDENCIES_REMOVED:
-                        if ping_data["origin"] != app_name:
-                            ping_data.update({"in_source": False})
-
-                    app_data["pings"].append(ping_data)
-
-                ping_data = next(pd for pd in app_data["pings"] if pd["name"] == ping.identifier)
-
-                if ping_data["include_client_id"]:
-                    pings_with_client_id.add(ping_data["name"])
-
-                # write table description (app variant specific)
-                ping_name_snakecase = stringcase.snakecase(ping.identifier)
-                stable_ping_table_name = f"{app.app['bq_dataset_family']}.{ping_name_snakecase}"
-                live_ping_table_name = (
-                    f"{app.app['bq_dataset_family']}_live.{ping_name_snakecase}_v1"
-                )
-                bq_path = (
-                    f"{app.app['document_namespace']}/{ping.identifier}/{ping.identifier}.1.bq"
-                )
-                bq_definition = (
-                    "https://github.com/mozilla-services/mozilla-pipeline-schemas/blob/generated-schemas/schemas/"  # noqa
-                    + bq_path
-                )
-                bq_schema = _pipeline_schema(mps_repo_path, bq_path)
-                app_channel = app.app.get("app_channel")
-                variant_data = dict(
-                    id=app_id,
-                    description=_get_app_variant_description(app),
-                    table=stable_ping_table_name,
-                    channel=app_channel if app_channel else "release",
-                )
-                looker_explores = get_looker_explores_for_ping(
-                    looker_namespaces, app, app_group, ping
-                )
-                if not app_is_deprecated and looker_explores:
-                    variant_data.update({"looker_explores": looker_explores})
-                ping_data["variants"].append(variant_data)
-                app_variant_table_dir = os.path.join(app_table_dir, _get_resource_path(app.app_id))
-                os.makedirs(app_variant_table_dir, exist_ok=True)
-                open(os.path.join(app_variant_table_dir, f"{ping.identifier}.json"), "w").write(
-                    dump_json(
-                        dict(
-                            bq_definition=bq_definition,
-                            bq_schema=bq_schema,
-                            live_table=live_ping_table_name,
-                            name=ping.identifier,
-                            stable_table=stable_ping_table_name,
-                            app_id=app_id,
-                            canonical_app_name=app.app["canonical_app_name"],
-                            app_tags=app_tags_for_app,
-                        )
-                    )
-                )
-
-            # metrics data
-            metrics = app.get_metrics()
-            app_sampling_info = metrics_sampling_info.get(app_name)
-            for metric in metrics:
-                if metric.identifier not in metric_identifiers_seen:
-                    metric_identifiers_seen.add(metric.identifier)
-
-                    # read the annotation, if any
-                    metric_annotation = _get_annotation(
-                        annotations_index, metric.definition["origin"], "metrics", metric.identifier
-                    )
-
-                    metric_sample_info: dict | None = (
-                        dict(app_sampling_info.get(metric.identifier))
-                        if app_sampling_info is not None
-                        and app_sampling_info.get(metric.identifier) is not None
-                        else None
-                    )
-                    is_sampled = metric_sample_info is not None
-
-                    metric_sampled_text = None
-                    if is_sampled:
-                        for channel in metric_sample_info:
-                            sampled_text = (
-                                str(metric_sample_info.get(channel)["sample_size"] * 100)
-                                + "% "
-                                + "on"
-                                if metric.definition["disabled"] is True
-                                else str(metric_sample_info.get(channel)["sample_size"] * 100)
-                                + "% "
-                                + "off"
-                            )
-                            metric_sample_info.get(channel)["sampled_text"] = sampled_text
-
-                            # We prefer the release channel text, but if it's
-                            # not available, we use the first available
-                            if not metric_sampled_text:
-                                metric_sampled_text = sampled_text
-                            if channel == "release":
-                                metric_sampled_text = sampled_text
-
-                    # Force all outside metrics as removed.
-                    if app_name in APPS_DEPENDENCIES_REMOVED:
-                        if metric.definition["origin"] != app_name:
-                            metric.definition.update({"in_source": False})
-                    base_definition = _incorporate_annotation(
-                        dict(
-                            name=metric.identifier,
-                            description=metric.description,
-                            tags=metric.tags,
-                            in_source=metric.definition["in_source"],
-                            latest_fx_release_version=latest_fx_release_version,
-                            extra_keys=metric.definition["extra_keys"]
-                            if "extra_keys" in metric.definition
-                            else None,
-                            type=metric.definition["type"],
-                            expires=get_mapped_expiry(
-                                metric.definition["expires"], app_name, product_details
-                            ),
-                            expiry_text=get_expiry_text(
-                                metric.definition["expires"], app_name, product_details
-                            ),
-                            sampled=is_sampled,
-                            sampled_text=metric_sampled_text
-                            if metric_sampled_text
-                            else "Not sampled",
-                            is_part_of_info_section=metric.bq_prefix
-                            in ["client_info", "ping_info"],
-                            bugs=metric.definition["bugs"],
-                            monitor=metric.definition.get("metadata", {}).get("monitor", {}),
-                            notification_emails=metric.definition["notification_emails"],
-                        ),
-                        metric_annotation,
-                    )
-
-                    if metric.definition["origin"] != app_name:
-                        base_definition.update({"origin": metric.definition["origin"]})
-
-                    # metrics with associated pings
-                    metric_pings["data"].append(
-                        dict(base_definition, pings=metric.definition["send_in_pings"])
-                    )
-
-                    # the summary of metrics
-                    app_data["metrics"].append(base_definition)
-
-                    # the full metric definition
-                    app_metrics[metric.identifier] = _expand_tags(
-                        _incorporate_annotation(
-                            dict(
-                                metric.definition,
-                                name=metric.identifier,
-                                tags=metric.tags,
-                                # convert send_in_pings to a list so we can sort (see below)
-                                send_in_pings=list(metric.definition["send_in_pings"]),
-                                repo_url=app.app["url"],
-                                variants=[],
-                                expires=base_definition["expires"],
-                                latest_fx_release_version=latest_fx_release_version,
-                                expiry_text=base_definition["expiry_text"],
-                                canonical_app_name=app.app["canonical_app_name"],
-                                app_tags=app_tags_for_app,
-                                sampling_info=metric_sample_info,
-                                monitor=base_definition["monitor"],
-                            ),
-                            metric_annotation,
-                            full=True,
-                        ),
-                        app_tags_for_objects,
-                    )
-
-                    if metric.definition["type"] == "event":
-                        app_metrics[metric.identifier]["event_info"] = {
-                            "name": get_event_name_and_category(metric.identifier)[1],
-                            "category": get_event_name_and_category(metric.identifier)[0],
-                        }
-
-                    # sort "send in pings" alphanumerically, except that `metrics`
-                    # should always be first if present and `deletion-request`
-                    # should be last
-                    ping_priority = {"metrics": 0, "deletion-request": 2}
-                    app_metrics[metric.identifier]["send_in_pings"].sort()
-                    app_metrics[metric.identifier]["send_in_pings"].sort(
-                        key=lambda ping: ping_priority.get(ping, 1)
-                    )
-
-                # BigQuery and Looker metadata is ping based
-                ping_data = {}
-                for ping_name in metric.definition["send_in_pings"]:
-                    ping_data[ping_name] = {
-                        "bigquery_table": get_bigquery_ping_table_name(
-                            app.app["bq_dataset_family"], ping_name
-                        )
-                    }
-                    # FIXME: if we allow the metadata format to change, we can
-                    # just set it up all in one go above
-                    looker_explores = get_looker_explores_for_metric(
-                        looker_namespaces,
-                        app,
-                        app_group,
-                        metric,
-                        ping_name,
-                        ping_name in pings_with_client_id,
-                    )
-                    if looker_explores:
-                        ping_data[ping_name].update({"looker_explores": looker_explores})
-                    glam_metadata = get_glam_metadata_for_metric(app, metric, ping_name)
-                    ping_data[ping_name].update(glam_metadata)
-
-                    event_monitoring_metadata = get_looker_monitoring_metadata_for_event(
-                        app, app_group, metric
-                    )
-                    if event_monitoring_metadata:
-                        ping_data[ping_name].update({"event_monitoring": event_monitoring_metadata})
-
-                etl = dict(
-                    ping_data=ping_data,
-                    bigquery_column_name=get_bigquery_column_name(metric),
-                )
-
-                app_metrics[metric.identifier]["variants"].append(
-                    dict(
-                        id=app.app_id,
-                        channel=app.app.get("app_channel", "release"),
-                        description=_get_app_variant_description(app),
-                        etl=etl,
-                    )
-                )
-
-        # write ping descriptions, resorting the app-specific parts in user preference order
-        for ping_data in app_data["pings"]:
-            ping_data["variants"].sort(key=lambda v: USER_CHANNEL_PRIORITY[v["channel"]])
-            open(os.path.join(app_ping_dir, f"{ping_data['name']}.json"), "w").write(
-                dump_json(
-                    _expand_tags(
-                        _incorporate_annotation(
-                            dict(
-                                ping_data,
-                                metrics=[
-                                    metric
-                                    for metric in metric_pings["data"]
-                                    if _is_metric_in_ping(metric, ping_data)
-                                ],
-                                tag_descriptions=app_tags_for_objects,
-                                canonical_app_name=app.app["canonical_app_name"],
-                                app_tags=app_tags_for_app,
-                            ),
-                            _get_annotation(
-                                annotations_index, ping_data["origin"], "pings", ping_data["name"]
-                            ),
-                            full=True,
-                        ),
-                        app_tags_for_objects,
-                    )
-                )
-            )
-
-        extract_auto_event("glean.element_click", app_name, app_data, app_metrics)
-        extract_auto_event("glean.page_load", app_name, app_data, app_metrics)
-
-        # write metrics, resorting the app-specific parts in user preference order
-        metrics_by_filename = {}
-        for metric_data in app_metrics.values():
-            metric_data["variants"].sort(key=lambda v: USER_CHANNEL_PRIORITY[v["channel"]])
-            filename = f"{_normalize_metrics(metric_data['name'])}.json"
-            existing = metrics_by_filename.get(filename)
-            if existing is None:
-                metrics_by_filename[filename] = metric_data
-                continue
-            # Resolve metric name collision.
-            winner, loser = _resolve_metric_collision(existing, metric_data)
-            metrics_by_filename[filename] = winner
-            logging.warning(
-                "Metric name collision for app %s: %r and %r both normalize to %s. "
-                "Keeping %r (in_source=%s); dropping %r (in_source=%s). "
-                "The dropped metric will not have its own page in the Glean "
-                "Dictionary or any consumer of its data (e.g. GLAM).",
-                app_name,
-                existing["name"],
-                metric_data["name"],
-                filename,
-                winner["name"],
-                winner.get("in_source"),
-                loser["name"],
-                loser.get("in_source"),
-            )
-
-        for filename, metric_data in metrics_by_filename.items():
-            open(os.path.join(app_metrics_dir, filename), "w").write(dump_json(metric_data))
-
-        # write tag metadata (if any)
-        if app_tags_for_objects:
-            tags = [{"name": k, "description": v} for (k, v) in app_tags_for_objects.items()]
-            app_data["tags"] = tags
-            for tag in tags:
-                tag_metrics = [
-                    metric
-                    for metric in app_data["metrics"]
-                    if tag["name"] in metric.get("tags", [])
-                ]
-                tag["metric_count"] = len(tag_metrics)
-        else:
-            app_data["tags"] = []
-
-        # sort the information in the app-level summary, then write it out
-        # (we don't sort application id information, that's already handled
-        # above)
-        for key in ["tags", "metrics", "pings"]:
-            if app_data.get(key):
-                app_data[key].sort(key=lambda v: v["name"])
-                # for tags, put those with no metrics associated with them at the
-                # end
-                if key == "tags":
-                    app_data[key].sort(key=lambda v: v["metric_count"] > 0, reverse=True)
-
-        open(os.path.join(app_dir, "index.json"), "w").write(
-            dump_json(
-                _incorporate_annotation(
-                    app_data, app_annotation.get("app", {}), app=True, full=True
+    # Process each grouping of apps into a set of summaries, app details, and all the rest
+    if jobs > 1:
+        # each app group is written out by a worker process, which only needs
+        # the probeinfo data for its own apps (shared inputs are handed to each
+        # worker once, when it starts)
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_app_group_worker,
+            initargs=(context, http_cache.get_http_cache()),
+        ) as executor:
+            futures = {
+                app_name: executor.submit(
+                    _write_app_group_in_worker,
+                    app_name,
+                    app_group,
+                    group_apps[app_name],
+                    get_cached_responses(_get_app_group_urls(group_apps[app_name])),
                 )
-            )
-        )
-
-        # write a search index for the app
-        open(os.path.join(functions_dir, f"metrics_search_{app_name}.js"), "w").write(
-            create_metrics_search_js(app_metrics.values(), app_name, legacy=False)
-        )
-
-        # export FOG data to a separate file for the FOG + legacy search index
-        if app_name == "firefox_desktop":
-            open(os.path.join(functions_dir, "metrics_search_fog.js"), "w").write(
-                create_metrics_search_js(app_metrics.values(), app_name="fog", legacy=False)
-            )
+                for (app_name, app_group) in pending_app_groups.items()
+            }
+            results = {app_name: future.result() for (app_name, future) in futures.items()}
+    else:
+        results = {
+            app_name: _write_app_group(context, app_name, app_group, apps)
+            for (app_name, app_group) in pending_app_groups.items()
+        }
+
+    output = OutputWriter()
+    for app_name, (app_summary, schema_hashes, counts) in results.items():
+        manifest.update(app_name, group_fingerprints[app_name], app_summary, schema_hashes)
+        app_summaries[app_name] = app_summary
+        output.counts.update(counts)
 
     # Write out a list of app groups (for the landing page)
     # put "featured" apps first, then sort by name
-    open(os.path.join(output_dir, "apps.json"), "w").write(
-        dump_json(
+    output.write(
+        os.path.join(output_dir, "apps.json"),
+        dump_json_bytes(
             sorted(
-                sorted(app_summaries, key=lambda s: s["app_name"]),
+                sorted(app_summaries.values(), key=lambda s: s["app_name"]),
                 key=lambda s: s.get("featured", False),
                 reverse=True,
             )
-        )
+        ),
     )
 
     # also write some metadata for use by the netlify functions
-    open(os.path.join(functions_dir, "supported_glam_metric_types.json"), "w").write(
-        dump_json(list(SUPPORTED_GLAM_METRIC_TYPES))
+    output.write(
+        os.path.join(functions_dir, "supported_glam_metric_types.json"),
+        dump_json_bytes(list(SUPPORTED_GLAM_METRIC_TYPES)),
     )
-    open(os.path.join(functions_dir, "glam_metrics_blocklist.json"), "w").write(
-        dump_json(GLAM_METRICS_BLOCKLIST)
+    output.write(
+        os.path.join(functions_dir, "glam_metrics_blocklist.json"),
+        dump_json_bytes(GLAM_METRICS_BLOCKLIST),
     )
 
-    _remove_mps_path(mps_repo_path)
+    if not app_names:
+        _remove_stale_app_groups(output, output_dir, functions_dir, set(app_groups))
+        manifest.retain(app_groups)
+        # we only know which schemas are still referenced once every app group
+        # is in the manifest
+        output.remove_stale(
+            context.schema_dir,
+            keep=[
+                os.path.join(context.schema_dir, f"{schema_hash}.json")
+                for schema_hash in manifest.get_schema_hashes()
+            ],
+        )
+    manifest.save(output, manifest_path)
+    # (manifests used to be kept in the output directory, where they'd be published)
+    output.remove(os.path.join(output_dir, LEGACY_MANIFEST_NAME))
+    return output.report("Glean metadata")
 
 
-def extract_auto_event(auto_event_name, app_name, app_data, app_metrics):
-    if auto_event_name in app_metrics:
-        auto_events_all_apps = get_auto_events_names()
-        auto_events_for_app = get_auto_events_for_app(app_name, auto_events_all_apps)
-        app_data["metrics"].extend(auto_events_for_app)
-        element_click_base = copy.deepcopy(app_metrics[auto_event_name])
-        for auto_event in auto_events_for_app:
-            element_click_base["name"] = auto_event["name"]
-            element_click_base["description"] = auto_event["description"]
-            element_click_base["event_info"].update(auto_event["event_info"])
-            app_metrics[auto_event["name"]] = copy.deepcopy(element_click_base)
+def get_auto_event_definitions(auto_event_base, auto_events_for_app):
+    """
+    The full definitions of an app's automatically instrumented events,
+    derived from that of their base event
+    """
+    # the definitions are only ever serialized, so they can share
+    # everything but the fields we change with the base event
+    return [
+        dict(
+            auto_event_base,
+            name=auto_event["name"],
+            description=auto_event["description"],
+            event_info=dict(auto_event_base["event_info"], **auto_event["event_info"]),
+        )
+        for auto_event in auto_events_for_app
+    ]
@@ -0,0 +1,242 @@
+"""
+A persistent, on-disk cache for the HTTP resources the ETL consumes.
+
+Responses are stored keyed by URL along with their validators (`ETag` and
+`Last-Modified`), and revalidated on the next request with a conditional GET:
+if the upstream server answers `304 Not Modified` we serve the body we already
+have instead of downloading it again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+from . import fetch
+from .utils import write_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "GLEAN_DICTIONARY_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "glean-dictionary", "http"),
+)
+DEFAULT_CACHE_MAX_SIZE = int(os.getenv("GLEAN_DICTIONARY_CACHE_MAX_SIZE", 2 * 1024**3))
+
+
+# size of the chunks we stream large responses to disk in
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+class CachedResponse:
+    """
+    A successful response whose body lives in the cache. Provides the subset of
+    the `requests.Response` interface that the ETL uses.
+    """
+
+    status_code = 200
+    ok = True
+
+    def __init__(self, url: str, content: bytes, from_cache: bool):
+        self.url = url
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        pass
+
+
+class HttpCache:
+    """
+    Cache of HTTP responses, stored as a `<key>.body` / `<key>.json` (metadata)
+    pair of files per URL
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return (base + ".json", base + ".body")
+
+    def _read_entry(self, url: str):
+        (meta_path, body_path) = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("url") != url or not os.path.exists(body_path):
+            return None
+        return entry
+
+    def _read_body(self, url: str) -> bytes:
+        with open(self._paths(url)[1], "rb") as f:
+            return f.read()
+
+    def _write_entry(self, url: str, entry: dict, content: bytes = None):
+        (meta_path, body_path) = self._paths(url)
+        if content is not None:
+            write_atomic(body_path, [content])
+        write_atomic(meta_path, [json.dumps(entry).encode("utf-8")])
+
+    @staticmethod
+    def _conditional_headers(entry):
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _touch(self, url: str, entry: dict):
+        logger.debug(f"{url} not modified, using cached copy")
+        entry["last_used"] = time.time()
+        self._write_entry(url, entry)
+
+    def get(self, url: str):
+        """
+        Get `url`, revalidating any copy we already have. Unsuccessful
+        responses are returned as-is and never cached.
+        """
+        entry = self._read_entry(url)
+        resp = fetch.get(url, headers=self._conditional_headers(entry))
+
+        if resp.status_code == 304 and entry:
+            self._touch(url, entry)
+            return CachedResponse(url, self._read_body(url), from_cache=True)
+
+        if resp.status_code != 200:
+            return resp
+
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if etag or last_modified:
+            # without a validator we'd have no way of revalidating the
+            # response, so there'd be no point in storing it
+            self._write_entry(
+                url,
+                {
+                    "url": url,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "size": len(resp.content),
+                    "last_used": time.time(),
+                },
+                resp.content,
+            )
+        return CachedResponse(url, resp.content, from_cache=False)
+
+    def get_file(self, url: str):
+        """
+        Like `get`, but streams the body to disk instead of holding it in
+        memory. Returns an open binary file, which the caller should close.
+        Raises `requests.HTTPError` for unsuccessful responses.
+        """
+        entry = self._read_entry(url)
+        body_path = self._paths(url)[1]
+        with fetch.get(url, headers=self._conditional_headers(entry), stream=True) as resp:
+            if resp.status_code == 304 and entry:
+                self._touch(url, entry)
+                return open(body_path, "rb")
+
+            resp.raise_for_status()
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+            if not (etag or last_modified):
+                f = tempfile.TemporaryFile()
+                for chunk in resp.iter_content(STREAM_CHUNK_SIZE):
+                    f.write(chunk)
+                f.seek(0)
+                return f
+
+            size = write_atomic(body_path, resp.iter_content(STREAM_CHUNK_SIZE))
+            self._write_entry(
+                url,
+                {
+                    "url": url,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "size": size,
+                    "last_used": time.time(),
+                },
+            )
+            return open(body_path, "rb")
+
+    def _entries(self):
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.directory, filename)
+            try:
+                with open(meta_path) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            entry["_paths"] = (meta_path, meta_path[: -len(".json")] + ".body")
+            entries.append(entry)
+        return entries
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "directory": self.directory,
+            "entries": len(entries),
+            "size": sum(entry.get("size", 0) for entry in entries),
+        }
+
+    def prune(self, max_size: int = DEFAULT_CACHE_MAX_SIZE) -> int:
+        """
+        Evict the least recently used entries until the cache is no bigger
+        than `max_size` bytes. Returns the number of entries evicted.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry.get("last_used", 0))
+        total_size = sum(entry.get("size", 0) for entry in entries)
+        evicted = 0
+        for entry in entries:
+            if total_size <= max_size:
+                break
+            for path in entry["_paths"]:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            total_size -= entry.get("size", 0)
+            evicted += 1
+        return evicted
+
+
+_http_cache = None
+
+
+def get_http_cache() -> HttpCache:
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = HttpCache()
+    return _http_cache
+
+
+def set_http_cache(cache: HttpCache):
+    global _http_cache
+    _http_cache = cache
+
+
+def get(url: str):
+    return get_http_cache().get(url)
+
+
+def get_file(url: str):
+    return get_http_cache().get_file(url)
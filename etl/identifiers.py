@@ -0,0 +1,93 @@
+"""
+Normalization of metric, ping and probe identifiers.
+
+The same identifiers get converted over and over during a build (e.g. a ping's
+name once for every metric sent in it), so every conversion here is memoized
+(for up to `IDENTIFIER_CACHE_SIZE` identifiers each) and uses patterns which
+are only compiled once.
+"""
+
+import re
+from functools import lru_cache
+
+# enough for every identifier of our largest apps, while keeping memory bounded
+IDENTIFIER_CACHE_SIZE = 65536
+
+# Certain words are blocked by uBlock Origin, so we need to map them to something else
+# to avoid the page being blocked
+# See: https://github.com/mozilla/glean-dictionary/issues/1682
+UBLOCK_ORIGIN_PRIVACY_FILTER = {"ad_impression": "advert_impression"}
+
+_SNAKECASE_SEPARATOR_PAT = re.compile(r"[\-\.\s]")
+_UPPERCASE_PAT = re.compile(r"[A-Z]")
+
+# ETL specific snakecase taken from:
+# https://github.com/mozilla/bigquery-etl/blob/master/bigquery_etl/util/common.py
+#
+# Search for all camelCase situations in reverse with arbitrary lookaheads.
+REV_WORD_BOUND_PAT = re.compile(
+    r"""
+    \b                                  # standard word boundary
+    |(?<=[a-z][A-Z])(?=\d*[A-Z])        # A7Aa -> A7|Aa boundary
+    |(?<=[a-z][A-Z])(?=\d*[a-z])        # a7Aa -> a7|Aa boundary
+    |(?<=[A-Z])(?=\d*[a-z])             # a7A -> a7|A boundary
+    """,
+    re.VERBOSE,
+)
+_NON_WORD_PAT = re.compile(r"[^\w]|_")
+
+_METRIC_PATH_CHARS_PAT = re.compile(r"[.\[\]/]")
+
+
+def _lowercase_with_underscore(match):
+    return "_" + match.group(0).lower()
+
+
+@lru_cache(maxsize=IDENTIFIER_CACHE_SIZE)
+def snakecase(identifier: str) -> str:
+    """
+    Convert an identifier to snake case, exactly as `stringcase.snakecase`
+    does (this is how ping and metric names map to BigQuery and Looker)
+    """
+    identifier = _SNAKECASE_SEPARATOR_PAT.sub("_", str(identifier))
+    if not identifier:
+        return identifier
+    return identifier[0].lower() + _UPPERCASE_PAT.sub(_lowercase_with_underscore, identifier[1:])
+
+
+@lru_cache(maxsize=IDENTIFIER_CACHE_SIZE)
+def etl_snake_case(line: str) -> str:
+    """Convert a string into a snake_cased string (as bigquery-etl does)."""
+    # replace non-alphanumeric characters with spaces in the reversed line
+    subbed = _NON_WORD_PAT.sub(" ", line[::-1])
+    # apply the regex on the reversed string
+    words = REV_WORD_BOUND_PAT.split(subbed)
+    # filter spaces between words and snake_case and reverse again
+    return "_".join([w.lower() for w in words if w.strip()])[::-1]
+
+
+@lru_cache(maxsize=IDENTIFIER_CACHE_SIZE)
+def normalize_metric_name(name: str) -> str:
+    """
+    The name of a metric as used for its data file
+    """
+    # replace ., [, ], / with _ so sirv doesn't think that a metric is a file
+    # or directory
+    metric_name = _METRIC_PATH_CHARS_PAT.sub("_", name)
+    for key, value in UBLOCK_ORIGIN_PRIVACY_FILTER.items():
+        if key in metric_name:
+            metric_name = metric_name.replace(key, value)
+
+    # if a metric name starts with "metrics", uBlock Origin
+    # will block the network call to get the JSON resource
+    # See: https://github.com/mozilla/glean-dictionary/issues/550
+    # To get around this, we add "data" to metric names
+    return f"data_{metric_name}"
+
+
+def normalize_metric_names(names) -> dict:
+    """
+    Normalize all of `names` (e.g. every metric of an app) at once, returning
+    a mapping of each name to its normalized form
+    """
+    return {name: normalize_metric_name(name) for name in names}
@@ -1,12 +1,11 @@
 import json
 
-import stringcase
-from furl import furl
-
 from etl.utils import get_event_name_and_category
 
 from .bigquery import get_bigquery_column_name, get_bigquery_ping_table_name
 from .glean import GLEAN_DISTRIBUTION_TYPES
+from .identifiers import snakecase
+from .urls import add_query_params, get_looker_explore_url
 
 SUPPORTED_LOOKER_METRIC_TYPES = GLEAN_DISTRIBUTION_TYPES | {
     "boolean",
@@ -23,29 +22,81 @@ SUPPORTED_LOOKER_METRIC_TYPES = GLEAN_DISTRIBUTION_TYPES | {
 EVENT_MONITORING_DASHBOARD_URL = "https://mozilla.cloud.looker.com/dashboards/1452"
 
 
-def _looker_explore_exists(looker_namespaces, app_name, explore_name):
-    return looker_namespaces.get(app_name, {}).get("explores", {}).get(explore_name)
+class LookerExplores:
+    """
+    The Looker explores which exist for each app (from looker-hub's
+    namespaces). The base explores for each app variant and ping are cached
+    as they're worked out, since every metric in a ping shares them.
+    """
+
+    def __init__(self, looker_namespaces):
+        self.looker_namespaces = looker_namespaces
+        # (app name, explore name) for every explore
+        self.explores = {
+            (app_name, explore_name)
+            for (app_name, namespace) in looker_namespaces.items()
+            for (explore_name, explore) in namespace.get("explores", {}).items()
+            if explore
+        }
+        self._base_explores = {}
+
+    def exists(self, app_name, explore_name):
+        return (app_name, explore_name) in self.explores
+
+    def get_event_explores(self, app, app_group):
+        app_channel = app.app.get("app_channel")
+        key = ("events", app.app_name, app_channel, len(app_group["app_ids"]) > 1)
+        if key not in self._base_explores:
+            self._base_explores[key] = _get_looker_event_explores(
+                self, app.app_name, app_channel, app_group
+            )
+        return self._base_explores[key]
+
+    def get_ping_explores(self, app, app_group, ping_name):
+        app_channel = app.app.get("app_channel")
+        key = ("ping", app.app_name, app_channel, len(app_group["app_ids"]) > 1, ping_name)
+        if key not in self._base_explores:
+            self._base_explores[key] = _get_looker_ping_explores(
+                self,
+                app.app_name,
+                ping_name,
+                get_bigquery_ping_table_name(app.app["bq_dataset_family"], ping_name),
+                app_channel,
+                app_group,
+            )
+        return self._base_explores[key]
+
+
+def _get_looker_explores(looker_namespaces) -> LookerExplores:
+    if isinstance(looker_namespaces, LookerExplores):
+        return looker_namespaces
+    return LookerExplores(looker_namespaces)
+
+
+def _looker_explore_exists(looker_explores, app_name, explore_name):
+    return looker_explores.exists(app_name, explore_name)
 
 
 def _get_looker_ping_explores(
-    looker_namespaces, app_name, ping_name, _table_name, app_channel, app_group
+    looker_explores, app_name, ping_name, _table_name, app_channel, app_group
 ):
     explores = []
-    ping_name_snakecase = stringcase.snakecase(ping_name)
-    if _looker_explore_exists(looker_namespaces, app_name, ping_name_snakecase):
-        url = furl(f"https://mozilla.cloud.looker.com/explore/{app_name}/{ping_name_snakecase}")
+    ping_name_snakecase = snakecase(ping_name)
+    if _looker_explore_exists(looker_explores, app_name, ping_name_snakecase):
+        url = get_looker_explore_url(app_name, ping_name_snakecase)
         # if there are multiple channels, we need a channel identifier
         if len(app_group["app_ids"]) > 1 and app_channel:
-            url = url.add({f"f[{ping_name_snakecase}.channel]": app_channel})
-        explores.append({"name": ping_name_snakecase, "url": url.url})
+            url = add_query_params(url, {f"f[{ping_name_snakecase}.channel]": app_channel})
+        explores.append({"name": ping_name_snakecase, "url": url})
     return explores or None
 
 
-def _get_looker_event_explores(looker_namespaces, app_name, app_channel, app_group):
+def _get_looker_event_explores(looker_explores, app_name, app_channel, app_group):
     explores = []
 
-    if _looker_explore_exists(looker_namespaces, app_name, "events_stream"):
-        url = furl(f"https://mozilla.cloud.looker.com/explore/{app_name}/events_stream").add(
+    if _looker_explore_exists(looker_explores, app_name, "events_stream"):
+        url = add_query_params(
+            get_looker_explore_url(app_name, "events_stream"),
             {
                 "fields": ",".join(
                     (
@@ -54,60 +105,59 @@ def _get_looker_event_explores(looker_namespaces, app_name, app_channel, app_gro
                         "events_stream.client_count",
                     )
                 )
-            }
+            },
         )
         if len(app_group["app_ids"]) > 1 and app_channel:
-            url.add({"f[events_stream.normalized_channel]": app_channel})
-        explores.append({"name": "events_stream", "url": url.url})
+            url = add_query_params(url, {"f[events_stream.normalized_channel]": app_channel})
+        explores.append({"name": "events_stream", "url": url})
 
     # firefox_desktop has an "events" explore that is for legacy telemetry,
     # not Glean
     if (
-        _looker_explore_exists(looker_namespaces, app_name, "events")
+        _looker_explore_exists(looker_explores, app_name, "events")
         and app_name != "firefox_desktop"
     ):
-        url = furl(f"https://mozilla.cloud.looker.com/explore/{app_name}/event_counts").add(
-            {"fields": "events.submission_date,events.event_count,events.client_count"}
+        url = add_query_params(
+            get_looker_explore_url(app_name, "event_counts"),
+            {"fields": "events.submission_date,events.event_count,events.client_count"},
         )
         if len(app_group["app_ids"]) > 1 and app_channel:
-            url.add({"f[events.normalized_channel]": app_channel})
-        explores.append({"name": "event_counts", "url": url.url})
+            url = add_query_params(url, {"f[events.normalized_channel]": app_channel})
+        explores.append({"name": "event_counts", "url": url})
     # firefox_desktop Glean events explore is glean_event_counts
-    elif _looker_explore_exists(looker_namespaces, app_name, "glean_event_counts"):
-        url = furl(f"https://mozilla.cloud.looker.com/explore/{app_name}/glean_event_counts").add(
+    elif _looker_explore_exists(looker_explores, app_name, "glean_event_counts"):
+        url = add_query_params(
+            get_looker_explore_url(app_name, "glean_event_counts"),
             {
                 "fields": "glean_events.submission_date,"
                 + "glean_events.event_count,glean_events.client_count"
-            }
+            },
         )
         if len(app_group["app_ids"]) > 1 and app_channel:
-            url.add({"f[events.normalized_channel]": app_channel})
-        explores.append({"name": "glean_event_counts", "url": url.url})
-    elif _looker_explore_exists(looker_namespaces, app_name, "funnel_analysis"):
-        url = furl(f"https://mozilla.cloud.looker.com/explore/{app_name}/funnel_analysis").add(
-            {"fields": "funnel_analysis.count_completed_step_1"}
+            url = add_query_params(url, {"f[events.normalized_channel]": app_channel})
+        explores.append({"name": "glean_event_counts", "url": url})
+    elif _looker_explore_exists(looker_explores, app_name, "funnel_analysis"):
+        url = add_query_params(
+            get_looker_explore_url(app_name, "funnel_analysis"),
+            {"fields": "funnel_analysis.count_completed_step_1"},
         )
         if len(app_group["app_ids"]) > 1 and app_channel:
-            url.add({"f[funnel_analysis.app_channel]": app_channel})
-        explores.append({"name": "funnel_analysis", "url": url.url})
+            url = add_query_params(url, {"f[funnel_analysis.app_channel]": app_channel})
+        explores.append({"name": "funnel_analysis", "url": url})
 
     return explores or None
 
 
 def get_looker_explores_for_ping(looker_namespaces, app, app_group, ping):
+    """
+    `looker_namespaces` is either a `LookerExplores` or the namespaces it's
+    built from
+    """
+    looker_explores = _get_looker_explores(looker_namespaces)
     if ping.identifier == "events":
-        return _get_looker_event_explores(
-            looker_namespaces, app.app_name, app.app.get("app_channel"), app_group
-        )
+        return looker_explores.get_event_explores(app, app_group)
 
-    return _get_looker_ping_explores(
-        looker_namespaces,
-        app.app_name,
-        ping.identifier,
-        get_bigquery_ping_table_name(app.app["bq_dataset_family"], ping.identifier),
-        app.app.get("app_channel"),
-        app_group,
-    )
+    return looker_explores.get_ping_explores(app, app_group, ping.identifier)
 
 
 def get_looker_explores_for_metric(
@@ -118,22 +168,14 @@ def get_looker_explores_for_metric(
         return None
 
     metric_type = metric.definition["type"]
-    metric_name_snakecase = stringcase.snakecase(metric.identifier)
-    ping_name_snakecase = stringcase.snakecase(ping_name)
+    metric_name_snakecase = snakecase(metric.identifier)
+    ping_name_snakecase = snakecase(ping_name)
 
+    looker_explores = _get_looker_explores(looker_namespaces)
     base_looker_explores = (
-        _get_looker_event_explores(
-            looker_namespaces, app.app_name, app.app.get("app_channel"), app_group
-        )
+        looker_explores.get_event_explores(app, app_group)
         if metric_type == "event"
-        else _get_looker_ping_explores(
-            looker_namespaces,
-            app.app_name,
-            ping_name,
-            get_bigquery_ping_table_name(app.app["bq_dataset_family"], ping_name),
-            app.app.get("app_channel"),
-            app_group,
-        )
+        else looker_explores.get_ping_explores(app, app_group, ping_name)
     )
 
     explores = []
@@ -142,32 +184,36 @@ def get_looker_explores_for_metric(
         if metric_type == "event":
             (metric_category, metric_name) = get_event_name_and_category(metric.identifier)
             if base_looker_explore["name"] == "glean_event_counts":
-                looker_metric_link = furl(base_looker_explore["url"]).add(
+                looker_metric_link = add_query_params(
+                    base_looker_explore["url"],
                     {
                         "f[glean_events.event_name]": f'"{metric_name}"',
                         "f[glean_events.event_category]": f'"{metric_category}"',
-                    }
+                    },
                 )
             elif base_looker_explore["name"] == "event_counts":
-                looker_metric_link = furl(base_looker_explore["url"]).add(
+                looker_metric_link = add_query_params(
+                    base_looker_explore["url"],
                     {
                         "f[events.event_name]": f'"{metric_name}"',
                         "f[events.event_category]": f'"{metric_category}"',
-                    }
+                    },
                 )
             elif base_looker_explore["name"] == "funnel_analysis":
-                looker_metric_link = furl(base_looker_explore["url"]).add(
+                looker_metric_link = add_query_params(
+                    base_looker_explore["url"],
                     {
                         "f[step_1.event]": f'"{metric_name}"',
                         "f[step_1.category]": f'"{metric_category}"',
-                    }
+                    },
                 )
             elif base_looker_explore["name"] == "events_stream":
-                looker_metric_link = furl(base_looker_explore["url"]).add(
+                looker_metric_link = add_query_params(
+                    base_looker_explore["url"],
                     {
                         "f[events_stream.event_category]": f'"{metric_category}"',
                         "f[events_stream.event_name]": f'"{metric_name}"',
-                    }
+                    },
                 )
             else:
                 # this should never happen (unless we made a mistake in getting the
@@ -175,7 +221,8 @@ def get_looker_explores_for_metric(
                 raise Exception(f"Unexpected base looker explore {base_looker_explore['name']}")
         # for counters, we can use measures directly
         elif metric_type == "counter":
-            looker_metric_link = furl(base_looker_explore["url"]).add(
+            looker_metric_link = add_query_params(
+                base_looker_explore["url"],
                 {
                     "fields": ",".join(
                         [
@@ -183,7 +230,7 @@ def get_looker_explores_for_metric(
                             f"{ping_name_snakecase}.{metric_name_snakecase}",
                         ]
                     )
-                }
+                },
             )
         elif metric_type == "labeled_counter":
             counter_field_base = (
@@ -191,7 +238,8 @@ def get_looker_explores_for_metric(
                 + "__metrics__labeled_counter__"
                 + f"{metric_name_snakecase}"
             )
-            looker_metric_link = furl(base_looker_explore["url"]).add(
+            looker_metric_link = add_query_params(
+                base_looker_explore["url"],
                 {
                     "fields": ",".join(
                         [
@@ -201,7 +249,7 @@ def get_looker_explores_for_metric(
                         ]
                     ),
                     "pivots": f"{counter_field_base}.label",
-                }
+                },
             )
         elif metric_type == "timespan":
             # Timespans are currently implemented as a dimension rather than a metric.
@@ -219,7 +267,8 @@ def get_looker_explores_for_metric(
                     type="median",
                 )
             ]
-            looker_metric_link = furl(base_looker_explore["url"]).add(
+            looker_metric_link = add_query_params(
+                base_looker_explore["url"],
                 {
                     "fields": ",".join(
                         [
@@ -228,7 +277,7 @@ def get_looker_explores_for_metric(
                         ]
                     ),
                     "dynamic_fields": json.dumps(dynamic_fields),
-                }
+                },
             )
         elif metric_type in SUPPORTED_LOOKER_METRIC_TYPES:
             base_looker_dimension_name = "{}.{}".format(
@@ -249,7 +298,8 @@ def get_looker_explores_for_metric(
                         type="sum",
                     )
                 ]
-                looker_metric_link = furl(base_looker_explore["url"]).add(
+                looker_metric_link = add_query_params(
+                    base_looker_explore["url"],
                     {
                         "fields": ",".join(
                             [
@@ -258,12 +308,13 @@ def get_looker_explores_for_metric(
                             ]
                         ),
                         "dynamic_fields": json.dumps(dynamic_fields),
-                    }
+                    },
                 )
             else:
                 # otherwise pivoting on the dimension is the best we can do (this works
                 # well for boolean measures)
-                looker_metric_link = furl(base_looker_explore["url"]).add(
+                looker_metric_link = add_query_params(
+                    base_looker_explore["url"],
                     {
                         "fields": ",".join(
                             [
@@ -277,7 +328,7 @@ def get_looker_explores_for_metric(
                             ]
                         ),
                         "pivots": base_looker_dimension_name,
-                    }
+                    },
                 )
 
         if looker_metric_link:
@@ -286,7 +337,7 @@ def get_looker_explores_for_metric(
                     "base": base_looker_explore,
                     "metric": {
                         "name": metric.identifier,
-                        "url": looker_metric_link.add({"toggle": "vis"}).url,
+                        "url": add_query_params(looker_metric_link, {"toggle": "vis"}),
                     },
                 }
             )
@@ -302,17 +353,18 @@ def get_looker_monitoring_metadata_for_event(app, app_group, metric):
     (metric_category, metric_name) = get_event_name_and_category(metric.identifier)
     event_identifier = ".".join([metric_category, metric_name])
 
-    url = furl(EVENT_MONITORING_DASHBOARD_URL).add(
-        {"App Name": app.app["canonical_app_name"], "Event Name": '"' + event_identifier + '"'}
+    url = add_query_params(
+        EVENT_MONITORING_DASHBOARD_URL,
+        {"App Name": app.app["canonical_app_name"], "Event Name": '"' + event_identifier + '"'},
     )
 
     app_channel = app.app.get("app_channel")
     if len(app_group["app_ids"]) > 1 and app_channel:
-        url.add({"Channel": app_channel})
+        url = add_query_params(url, {"Channel": app_channel})
 
     return {
         "event": {
             "name": metric_name,
-            "url": url.url,
+            "url": url,
         },
     }
@@ -0,0 +1,144 @@
+"""
+Manifest of the inputs each app group in the dictionary was built from.
+
+For every app group we record a fingerprint (hash) of everything that affects
+its output, along with its summary for the list of apps. A subsequent build
+into the same output directory can then skip any app group whose fingerprint
+hasn't changed, keeping the output it wrote last time.
+
+Manifests are internal build state, so they are kept outside of the (published)
+output directory, in `manifest_dir` (with one manifest per output directory).
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+
+from .utils import dump_json_bytes
+
+DEFAULT_MANIFEST_DIR = os.getenv(
+    "GLEAN_DICTIONARY_MANIFEST_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "glean-dictionary", "manifests"),
+)
+# where manifests used to be kept (inside the output directory)
+LEGACY_MANIFEST_NAME = ".manifest.json"
+# bump this to invalidate existing manifests if their format changes
+MANIFEST_VERSION = 2
+
+
+def fingerprint(*parts) -> str:
+    """
+    Hash `parts`, each of which is either bytes or JSON serializable data
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True).encode("utf-8")
+        # length-prefix each part, so that different splits of the same bytes
+        # don't produce the same fingerprint
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def get_source_fingerprint() -> str:
+    """
+    Fingerprint of the ETL code itself: any change to it can change the output
+    """
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = sorted(
+        path for path in glob.glob(os.path.join(source_dir, "*")) if path.endswith((".py", ".tmpl"))
+    )
+    contents = []
+    for path in paths:
+        with open(path, "rb") as f:
+            contents.append(f.read())
+    return fingerprint(*contents)
+
+
+def get_directory_fingerprint(directory) -> str:
+    """
+    Fingerprint of every file underneath `directory` (which may not exist)
+    """
+    parts = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            parts.append(os.path.relpath(path, directory))
+            with open(path, "rb") as f:
+                parts.append(f.read())
+    return fingerprint(*parts)
+
+
+def get_manifest_path(manifest_dir, output_dir) -> str:
+    """
+    The path of the manifest for builds into `output_dir`
+    """
+    output_dir_hash = hashlib.sha256(os.path.abspath(output_dir).encode("utf-8")).hexdigest()
+    return os.path.join(manifest_dir, f"{output_dir_hash[:16]}.json")
+
+
+class BuildManifest:
+    """
+    The fingerprint, app summary and referenced schemas of each app group in
+    a build
+    """
+
+    def __init__(self, groups: dict = None):
+        # app name -> {"fingerprint": ..., "app_summary": ..., "schema_hashes": [...]}
+        self.groups = groups or {}
+
+    @staticmethod
+    def load(path):
+        """
+        Load the manifest at `path` from a previous build, or an empty one if
+        there isn't a (usable) one
+        """
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return BuildManifest()
+        except (OSError, ValueError):
+            logging.warning(f"Ignoring unreadable build manifest {path}")
+            return BuildManifest()
+        if manifest.get("version") != MANIFEST_VERSION:
+            return BuildManifest()
+        return BuildManifest(manifest["groups"])
+
+    def is_current(self, app_name, group_fingerprint) -> bool:
+        group = self.groups.get(app_name)
+        return group is not None and group["fingerprint"] == group_fingerprint
+
+    def get_app_summary(self, app_name):
+        return self.groups[app_name]["app_summary"]
+
+    def get_schema_hashes(self):
+        return {
+            schema_hash for group in self.groups.values() for schema_hash in group["schema_hashes"]
+        }
+
+    def update(self, app_name, group_fingerprint, app_summary, schema_hashes):
+        self.groups[app_name] = {
+            "fingerprint": group_fingerprint,
+            "app_summary": app_summary,
+            "schema_hashes": schema_hashes,
+        }
+
+    def retain(self, app_names):
+        """
+        Forget about any app group not in `app_names`
+        """
+        self.groups = {
+            app_name: group for (app_name, group) in self.groups.items() if app_name in app_names
+        }
+
+    def save(self, output, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        output.write(
+            path,
+            dump_json_bytes({"version": MANIFEST_VERSION, "groups": self.groups}),
+        )
@@ -0,0 +1,183 @@
+"""
+Writer for the files the ETL generates.
+
+Files are only written if their content actually changed, so that unchanged
+files keep their modification times (and don't need to be re-hashed or
+re-uploaded by the deploy), and are written atomically so that a reader never
+sees a partially written file. Files which weren't written in a build can be
+removed as stale.
+
+Writing can optionally be done by background threads, so that the ETL can get
+on with generating the next file while the previous ones are being written.
+"""
+
+import logging
+import os
+import queue
+import threading
+from collections import Counter
+
+from .compress import COMPRESSED_SUFFIXES
+from .utils import write_atomic
+
+# Default number of background threads writing out files
+DEFAULT_WRITER_THREADS = 4
+# Maximum number of files waiting to be written, beyond which `write` blocks
+# (so we don't hold an unbounded amount of output in memory)
+MAX_PENDING_WRITES = 256
+
+
+def _is_unchanged(path, content: bytes) -> bool:
+    try:
+        if os.path.getsize(path) != len(content):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == content
+    except FileNotFoundError:
+        return False
+
+
+class OutputWriter:
+    """
+    Writes out files if they changed, keeping track of what was written
+
+    With `threads` > 0, files are written by that many background threads:
+    call `flush` to wait for everything so far to be written (raising the
+    first error any of them hit), and `close` when done with the writer.
+    """
+
+    def __init__(self, threads=0):
+        self.paths = set()
+        self.counts = Counter(written=0, skipped=0, deleted=0)
+        self._lock = threading.Lock()
+        self._error = None
+        # each thread has its own queue, and all writes to a given path go to
+        # the same one, so they happen in the order they were made
+        self._queues = [
+            queue.Queue(maxsize=max(1, MAX_PENDING_WRITES // threads)) for _ in range(threads)
+        ]
+        self._threads = [
+            threading.Thread(target=self._write_pending, args=(q,), daemon=True)
+            for q in self._queues
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+        # don't hide the error we're already handling behind one from writing
+        try:
+            self.close()
+        except Exception:
+            logging.exception("Error writing output (while handling another error)")
+
+    def _write_file(self, path, content: bytes):
+        if _is_unchanged(path, content):
+            outcome = "skipped"
+        else:
+            write_atomic(path, [content])
+            outcome = "written"
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def _write_pending(self, pending):
+        while True:
+            item = pending.get()
+            try:
+                if item is None:
+                    return
+                self._write_file(*item)
+            except BaseException as e:
+                with self._lock:
+                    if self._error is None:
+                        self._error = e
+            finally:
+                pending.task_done()
+
+    def _raise_error(self):
+        with self._lock:
+            (error, self._error) = (self._error, None)
+        if error is not None:
+            raise error
+
+    def write(self, path, content):
+        """
+        Write `content` (str or bytes) to `path`, unless it already has exactly
+        that content
+        """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        path = os.path.normpath(path)
+        self.paths.add(path)
+        if not self._threads:
+            self._write_file(path, content)
+            return
+        # fail early if a previous write failed
+        self._raise_error()
+        self._queues[hash(path) % len(self._queues)].put((path, content))
+
+    def flush(self):
+        """
+        Wait for every pending write to finish, raising the first error any of
+        them hit
+        """
+        for pending in self._queues:
+            pending.join()
+        self._raise_error()
+
+    def close(self):
+        """
+        Stop the background threads, once all pending writes have finished
+        """
+        for pending in self._queues:
+            pending.put(None)
+        for thread in self._threads:
+            thread.join()
+        (self._queues, self._threads) = ([], [])
+        self._raise_error()
+
+    def remove_stale(self, directory, keep=()):
+        """
+        Remove any file underneath `directory` which we didn't write (and isn't
+        in `keep`), along with any directories left empty. Compressed variants
+        of the files we keep are kept too.
+        """
+        # pending writes need their directories to still exist
+        self.flush()
+        keep = self.paths | {os.path.normpath(path) for path in keep}
+        for root, _, files in os.walk(directory, topdown=False):
+            for filename in files:
+                path = os.path.normpath(os.path.join(root, filename))
+                (source_path, extension) = os.path.splitext(path)
+                if path in keep or (extension in COMPRESSED_SUFFIXES and source_path in keep):
+                    continue
+                os.unlink(path)
+                self.counts["deleted"] += 1
+            if root != directory and not os.listdir(root):
+                os.rmdir(root)
+
+    def remove(self, path):
+        """
+        Remove the file at `path` (which we didn't write), if it exists
+        """
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return
+        self.counts["deleted"] += 1
+
+    def report(self, name) -> str:
+        """
+        A one-line report of how many files were written, skipped and deleted
+        (once every pending write has finished)
+        """
+        self.flush()
+        return (
+            f"{name}: wrote {self.counts['written']} files, skipped "
+            f"{self.counts['skipped']} unchanged, deleted {self.counts['deleted']} stale"
+        )
@@ -14,15 +14,17 @@ FOG_AND_LEGACY_SEARCH_JS_TEMPLATE = jinja2.Template(
 
 FOG_DATA_JS_TEMPLATE = jinja2.Template(open(Path(__file__).resolve().parent / "fog.js.tmpl").read())
 
+# the fields of each metric which go into the search index
+GLEAN_SEARCH_KEYS = ["type", "description", "expires"]
+LEGACY_SEARCH_KEYS = ["type", "description", "active"]
+
 
 def create_metrics_search_js(metrics, app_name=None, legacy=False):
     """
     Take a list of metrics and create a search.js file for them.
     """
 
-    search_keys = (
-        ["type", "description", "active"] if legacy else ["type", "description", "expires"]
-    )
+    search_keys = LEGACY_SEARCH_KEYS if legacy else GLEAN_SEARCH_KEYS
     metric_data = {metric["name"]: {k: metric[k] for k in search_keys} for metric in metrics}
 
     # remove redundant data expires == "never" and "active" from search metric data
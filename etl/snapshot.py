@@ -0,0 +1,171 @@
+"""
+Record/replay of every upstream resource a build consumes.
+
+A snapshot is a tar file holding the HTTP responses the ETL received (keyed by
+URL) and the mozilla-pipeline-schemas files it read. Replaying a snapshot
+rebuilds exactly the same output without touching the network, which makes
+builds reproducible and lets us benchmark the ETL itself in isolation.
+"""
+
+import hashlib
+import io
+import json
+import os
+import tarfile
+import threading
+
+import requests
+
+INDEX_NAME = "index.json"
+RESPONSES_DIR = "responses"
+FILES_DIR = "files"
+
+
+class SnapshotMissError(Exception):
+    """
+    Raised when replaying a snapshot which doesn't contain a requested resource
+    """
+
+    pass
+
+
+class SnapshotResponse:
+    """
+    A response replayed from a snapshot. Provides the subset of the
+    `requests.Response` interface that the ETL uses.
+    """
+
+    def __init__(self, url: str, status_code: int, content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+class Snapshot:
+    """
+    The set of responses and files making up a snapshot
+    """
+
+    def __init__(self, responses: dict = None, files: dict = None):
+        # url -> (status code, content)
+        self.responses = responses or {}
+        # path -> content
+        self.files = files or {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # locks can't be pickled (e.g. when handing the snapshot to a worker
+        # process), so we leave ours behind and make a new one on the other side
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add_response(self, url: str, status_code: int, content: bytes):
+        with self._lock:
+            self.responses[url] = (status_code, content)
+
+    def add_file(self, path: str, content: bytes):
+        with self._lock:
+            self.files[path] = content
+
+    def save(self, path: str):
+        index = {"responses": {}, "files": []}
+
+        def add_member(tar, name, content):
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+
+        with tarfile.open(path, "w") as tar:
+            for url, (status_code, content) in sorted(self.responses.items()):
+                member = f"{RESPONSES_DIR}/{hashlib.sha256(url.encode('utf-8')).hexdigest()}"
+                index["responses"][url] = {"status_code": status_code, "member": member}
+                add_member(tar, member, content)
+            for file_path, content in sorted(self.files.items()):
+                index["files"].append(file_path)
+                add_member(tar, f"{FILES_DIR}/{file_path}", content)
+            add_member(tar, INDEX_NAME, json.dumps(index, indent=2).encode("utf-8"))
+
+    @staticmethod
+    def load(path: str):
+        with tarfile.open(path, "r") as tar:
+            index = json.load(tar.extractfile(INDEX_NAME))
+            responses = {
+                url: (entry["status_code"], tar.extractfile(entry["member"]).read())
+                for url, entry in index["responses"].items()
+            }
+            files = {
+                file_path: tar.extractfile(f"{FILES_DIR}/{file_path}").read()
+                for file_path in index["files"]
+            }
+        return Snapshot(responses, files)
+
+    def extract_files(self, directory: str):
+        """
+        Write out the files in the snapshot underneath `directory`
+        """
+        for file_path, content in self.files.items():
+            full_path = os.path.join(directory, file_path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "wb") as f:
+                f.write(content)
+
+
+class RecordingHttpCache:
+    """
+    Wraps an HTTP cache, recording every response it hands out into `snapshot`
+    """
+
+    def __init__(self, http_cache, snapshot: Snapshot):
+        self.http_cache = http_cache
+        self.snapshot = snapshot
+
+    def get(self, url: str):
+        resp = self.http_cache.get(url)
+        self.snapshot.add_response(url, resp.status_code, resp.content)
+        return resp
+
+    def get_file(self, url: str):
+        f = self.http_cache.get_file(url)
+        self.snapshot.add_response(url, 200, f.read())
+        f.seek(0)
+        return f
+
+
+class ReplayHttpCache:
+    """
+    Serves responses from `snapshot`, never touching the network
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+
+    def get(self, url: str):
+        if url not in self.snapshot.responses:
+            raise SnapshotMissError(f"{url} is not in the snapshot being replayed")
+        (status_code, content) = self.snapshot.responses[url]
+        return SnapshotResponse(url, status_code, content)
+
+    def get_file(self, url: str):
+        resp = self.get(url)
+        resp.raise_for_status()
+        return io.BytesIO(resp.content)
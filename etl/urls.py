@@ -0,0 +1,49 @@
+"""
+Building the links to Looker in the dictionary.
+
+We generate several links per metric, per ping and per app variant, so this
+needs to be cheap. Rather than parsing each URL into a `furl` object, adding
+parameters to it and re-encoding the whole thing, URLs are plain strings which
+we only ever append already-encoded query parameters to. The output is the same
+as `furl` would produce.
+"""
+
+from functools import lru_cache
+from urllib.parse import quote, quote_plus
+
+LOOKER_EXPLORE_URL_TEMPLATE = "https://mozilla.cloud.looker.com/explore/{}/{}"
+
+# characters left as-is in path segments (as by `furl`)
+SAFE_SEGMENT_CHARS = ":@-._~!$&'()*+,;="
+
+
+def quote_query_component(s: str) -> str:
+    """
+    Encode a query parameter's key or value: only unreserved characters are
+    left as-is, and spaces become `+`
+    """
+    return quote_plus(s, safe="")
+
+
+# the keys (and many of the values) of query parameters come from a small set
+_quote_query_component = lru_cache(maxsize=4096)(quote_query_component)
+
+
+def get_looker_explore_url(app_name: str, explore_name: str) -> str:
+    return LOOKER_EXPLORE_URL_TEMPLATE.format(
+        quote(app_name, safe=SAFE_SEGMENT_CHARS), quote(explore_name, safe=SAFE_SEGMENT_CHARS)
+    )
+
+
+def add_query_params(url: str, params: dict) -> str:
+    """
+    Append `params` to the query string of `url` (which must already be
+    encoded, e.g. built by this module)
+    """
+    if not params:
+        return url
+    query = "&".join(
+        _quote_query_component(key) + "=" + _quote_query_component(value)
+        for (key, value) in params.items()
+    )
+    return url + ("&" if "?" in url else "?") + query
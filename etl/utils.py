@@ -1,28 +1,87 @@
+import codecs
 import json
+import os
 import re
+import tempfile
 
-# Search for all camelCase situations in reverse with arbitrary lookaheads.
-REV_WORD_BOUND_PAT = re.compile(
-    r"""
-    \b                                  # standard word boundary
-    |(?<=[a-z][A-Z])(?=\d*[A-Z])        # A7Aa -> A7|Aa boundary
-    |(?<=[a-z][A-Z])(?=\d*[a-z])        # a7Aa -> a7|Aa boundary
-    |(?<=[A-Z])(?=\d*[a-z])             # a7A -> a7|A boundary
-    """,
-    re.VERBOSE,
-)
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# what can follow a complete value within an object
+_JSON_VALUE_DELIMITERS = {",", "}", ":", " ", "\t", "\n", "\r"}
 
-def snake_case(line: str) -> str:
-    """Convert a string into a snake_cased string.
-    Copied from github.com/mozilla/bigquery-etl/blob/main/bigquery_etl/util/common.py#L27
+
+def iter_json_object_items(fp, chunk_size=1024 * 1024):
+    """
+    Incrementally parse a JSON document whose top level is an object from the
+    binary file `fp`, yielding its `(key, value)` pairs one at a time.
+
+    Only one value (plus a read buffer) is held in memory at once, so this can
+    be used on documents far larger than we'd like to load in one go.
     """
-    # replace non-alphanumeric characters with spaces in the reversed line
-    subbed = re.sub(r"[^\w]|_", " ", line[::-1])
-    # apply the regex on the reversed string
-    words = REV_WORD_BOUND_PAT.split(subbed)
-    # filter spaces between words and snake_case and reverse again
-    return "_".join([w.lower() for w in words if w.strip()])[::-1]
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        # read another chunk, dropping the part of the buffer we've consumed
+        nonlocal buf, pos, eof
+        chunk = fp.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + decoder.decode(chunk, final=eof)
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            pos = _JSON_WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    def expect(char):
+        nonlocal pos
+        skip_whitespace()
+        if buf[pos : pos + 1] != char:
+            raise ValueError(f"Expected {char!r} at position {pos} of JSON object stream")
+        pos += 1
+
+    def decode_value():
+        nonlocal pos
+        skip_whitespace()
+        while True:
+            try:
+                (value, end) = _JSON_DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # a value not followed by a delimiter (e.g. a number we only have
+            # the start of, like `1.` or `-3e`) might continue in the next chunk
+            if buf[end : end + 1] not in _JSON_VALUE_DELIMITERS and not eof:
+                fill()
+                continue
+            pos = end
+            return value
+
+    expect("{")
+    skip_whitespace()
+    if buf[pos : pos + 1] == "}":
+        return
+    while True:
+        key = decode_value()
+        expect(":")
+        yield (key, decode_value())
+        skip_whitespace()
+        if buf[pos : pos + 1] == "}":
+            return
+        expect(",")
 
 
 def _serialize_sets(obj):
@@ -31,16 +90,88 @@ def _serialize_sets(obj):
     return obj
 
 
-def dump_json(data):
+def _dump_json_bytes_stdlib(data) -> bytes:
+    # with the default `ensure_ascii`, the output is always plain ASCII
+    return json.dumps(data, separators=(",", ":"), default=_serialize_sets).encode("ascii")
+
+
+# `orjson` writes floats the same as `json`, except for those it writes with an
+# exponent (e.g. `1e16` rather than `1e+16`) or those `json` does (e.g. `0.00001`
+# rather than `1e-05`). Any output which might contain one of those (a digit
+# followed by an exponent, or a run of leading zeros, possibly within a string)
+# gets serialized again with `json`.
+_EXPONENT_PAT = re.compile(rb"e[-0-9]")
+_DIGITS_TO_ZERO = bytes.maketrans(b"123456789", b"000000000")
+
+
+def _orjson_maybe_different_float(serialized: bytes) -> bool:
+    # (checking for the cheapest things first)
+    if b".0000" in serialized:
+        return True
+    if not _EXPONENT_PAT.search(serialized):
+        return False
+    serialized = serialized.translate(_DIGITS_TO_ZERO)
+    return b"0e0" in serialized or b"0e-" in serialized
+
+
+# ... and leaves non-ASCII (and DEL) characters unescaped, where `json` escapes
+# them (as UTF-16)
+_NON_ASCII_PAT = re.compile(r"[^\x00-\x7e]")
+
+
+def _escape_non_ascii(match):
+    n = ord(match.group(0))
+    if n < 0x10000:
+        return f"\\u{n:04x}"
+    n -= 0x10000
+    return f"\\u{0xD800 | (n >> 10):04x}\\u{0xDC00 | (n & 0x3FF):04x}"
+
+
+def _dump_json_bytes_orjson(data) -> bytes:
+    try:
+        serialized = orjson.dumps(data, default=_serialize_sets)
+    except TypeError:
+        # something `orjson` can't serialize (e.g. an integer over 64 bits or a
+        # non-string key): leave it to `json`, which raises if it can't either
+        return _dump_json_bytes_stdlib(data)
+    if _orjson_maybe_different_float(serialized):
+        return _dump_json_bytes_stdlib(data)
+    if not serialized.isascii() or b"\x7f" in serialized:
+        serialized = _NON_ASCII_PAT.sub(_escape_non_ascii, serialized.decode("utf-8")).encode(
+            "ascii"
+        )
+    return serialized
+
+
+JSON_BACKENDS = {"json": _dump_json_bytes_stdlib}
+if orjson is not None:
+    JSON_BACKENDS["orjson"] = _dump_json_bytes_orjson
+
+# use the fastest backend available
+_dump_json_bytes = JSON_BACKENDS["orjson" if orjson is not None else "json"]
+
+
+def dump_json_bytes(data) -> bytes:
     """
-    Utility function for dumping json data
+    Utility function for dumping json data, as `bytes` ready to be written out
 
     There are two differences from a plain call to json.dumps:
 
     1. Sets are serialized to lists
     2. We dump the data without spaces (since we want things as small as possible)
+
+    The output is the same whichever backend is used (except for `NaN` and
+    infinite floats, which aren't valid JSON anyway and which `orjson` writes as
+    `null`)
     """
-    return json.dumps(data, separators=(",", ":"), default=_serialize_sets)
+    return _dump_json_bytes(data)
+
+
+def dump_json(data):
+    """
+    Like `dump_json_bytes`, but returning a `str` (e.g. to embed in a template)
+    """
+    return _dump_json_bytes(data).decode("ascii")
 
 
 def get_event_name_and_category(event_identifier: str):
@@ -57,3 +188,36 @@ def get_event_name_and_category(event_identifier: str):
     name = "click_metric"
     """
     return event_identifier.rsplit(".", maxsplit=1)
+
+
+def _get_umask():
+    # the only way to read the umask is to set it
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# `mkstemp` creates files only readable by us: give them the permissions
+# `open` would have instead
+_FILE_MODE = 0o666 & ~_get_umask()
+
+
+def write_atomic(path, chunks) -> int:
+    """
+    Write an iterable of byte `chunks` to `path` atomically (readers see either
+    the old or the new file, never a partial one), returning the number of
+    bytes written
+    """
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        os.chmod(tmp_path, _FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return size
@@ -0,0 +1,64 @@
+"""
+Benchmark a full build of a large synthetic application, checking that build
+time grows (roughly) linearly with the number of metrics.
+
+Run with: python -m etl_tests.bench_build
+"""
+
+import os
+import tempfile
+import time
+
+import click
+
+from .synthetic import build_from_snapshot, make_snapshot
+
+# how much slower building twice as many metrics may be, before we consider
+# the build to be scaling worse than linearly
+MAX_DOUBLING_RATIO = 2.6
+
+
+def time_build(num_metrics, num_pings, num_tags, repeat=1):
+    """
+    Time a build of a synthetic app with the given numbers of metrics, pings
+    and tags (returning the best time of `repeat` runs)
+    """
+    snapshot = make_snapshot(
+        num_metrics=num_metrics, num_pings=num_pings, num_tags=num_tags, num_legacy_probes=10
+    )
+    timings = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (output_dir, functions_dir) = (
+                os.path.join(tmpdir, "data"),
+                os.path.join(tmpdir, "functions"),
+            )
+            os.makedirs(functions_dir)
+            start = time.perf_counter()
+            build_from_snapshot(snapshot, output_dir, functions_dir)
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.command()
+@click.option("--metrics", "num_metrics", default=10000, show_default=True)
+@click.option("--pings", "num_pings", default=100, show_default=True)
+@click.option("--tags", "num_tags", default=500, show_default=True)
+@click.option("--repeat", default=3, show_default=True)
+def main(num_metrics, num_pings, num_tags, repeat):
+    timings = {}
+    for scale in (num_metrics // 4, num_metrics // 2, num_metrics):
+        timings[scale] = time_build(scale, num_pings, num_tags, repeat=repeat)
+        click.echo(
+            f"{scale:>7} metrics: {timings[scale]:.2f}s "
+            f"({timings[scale] / scale * 1000:.3f}ms per metric)"
+        )
+
+    ratio = timings[num_metrics] / timings[num_metrics // 2]
+    click.echo(f"doubling the metrics took {ratio:.2f}x as long")
+    if ratio > MAX_DOUBLING_RATIO:
+        raise click.ClickException("build time is growing faster than linearly")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark working out the first/last dates of every metric in a probeinfo
+metrics payload, comparing ISO strings (as `GleanMetric` does) against parsing
+every date into a `datetime` (as it used to).
+
+Run with: python -m etl_tests.bench_dates [--payload firefox-desktop-metrics.json]
+
+(the full firefox_desktop payload can be downloaded from
+https://probeinfo.telemetry.mozilla.org/glean/firefox-desktop/metrics; without
+one, a synthetic payload of a similar size is used)
+"""
+
+import json
+import time
+from datetime import datetime
+
+import click
+
+from etl.glean import _get_date_range
+
+from .synthetic import _dates
+
+
+def _get_synthetic_payload(num_metrics, history_length):
+    return {
+        f"metric_{i}": {"history": [{"dates": _dates(i + j)} for j in range(history_length)]}
+        for i in range(num_metrics)
+    }
+
+
+def _get_date_range_with_datetimes(dates):
+    values = [datetime.fromisoformat(date) for date in dates]
+    return (min(values), max(values))
+
+
+def time_date_ranges(payload, get_date_range, repeat):
+    histories = [[d["dates"]["first"] for d in metric["history"]] for metric in payload.values()]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for dates in histories:
+            get_date_range(dates)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.command()
+@click.option("--payload", "payload_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--metrics", "num_metrics", default=7000, show_default=True)
+@click.option("--history", "history_length", default=12, show_default=True)
+@click.option("--repeat", default=5, show_default=True)
+def main(payload_path, num_metrics, history_length, repeat):
+    if payload_path:
+        with open(payload_path) as f:
+            payload = json.load(f)
+    else:
+        payload = _get_synthetic_payload(num_metrics, history_length)
+
+    num_dates = sum(len(metric["history"]) for metric in payload.values())
+    click.echo(f"{len(payload)} metrics, {num_dates} history entries")
+    before = time_date_ranges(payload, _get_date_range_with_datetimes, repeat)
+    after = time_date_ranges(payload, _get_date_range, repeat)
+    click.echo(f"parsing every date: {before * 1000:.1f}ms")
+    click.echo(f"comparing ISO strings: {after * 1000:.1f}ms ({before / after:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
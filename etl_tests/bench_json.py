@@ -0,0 +1,64 @@
+"""
+Benchmark serializing the data files of a synthetic build with each of
+`etl.utils.JSON_BACKENDS`, checking that they all produce the same output.
+
+Run with: python -m etl_tests.bench_json
+"""
+
+import glob
+import json
+import os
+import tempfile
+import time
+
+import click
+
+from etl.utils import JSON_BACKENDS
+
+from .synthetic import build_from_snapshot, make_snapshot
+
+
+def load_output_files(num_metrics):
+    snapshot = make_snapshot(num_metrics=num_metrics, num_legacy_probes=1000)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        (output_dir, functions_dir) = (
+            os.path.join(tmpdir, "data"),
+            os.path.join(tmpdir, "functions"),
+        )
+        os.makedirs(functions_dir)
+        build_from_snapshot(snapshot, output_dir, functions_dir)
+        paths = glob.glob(os.path.join(output_dir, "**", "*.json"), recursive=True)
+        objs = []
+        for path in paths:
+            with open(path) as f:
+                objs.append(json.load(f))
+        return objs
+
+
+def time_serialization(objs, dump, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for obj in objs:
+            dump(obj)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.command()
+@click.option("--metrics", "num_metrics", default=5000, show_default=True)
+@click.option("--repeat", default=5, show_default=True)
+def main(num_metrics, repeat):
+    objs = load_output_files(num_metrics)
+    click.echo(f"{len(objs)} files")
+    expected = [JSON_BACKENDS["json"](obj) for obj in objs]
+    baseline = None
+    for name, dump in JSON_BACKENDS.items():
+        assert [dump(obj) for obj in objs] == expected, f"{name} output differs from json"
+        elapsed = time_serialization(objs, dump, repeat)
+        baseline = baseline or elapsed
+        click.echo(f"{name:>8}: {elapsed * 1000:.1f}ms ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
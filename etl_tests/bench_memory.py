@@ -0,0 +1,79 @@
+"""
+Benchmark the memory used by the metrics, pings and tags of a large synthetic
+app, as held in memory during a build.
+
+Peak RSS is measured in a fresh process, once after just loading the
+synthetic data and once after also building the objects for every app, so
+the difference is what the objects themselves cost.
+
+Run with: python -m etl_tests.bench_memory
+"""
+
+import multiprocessing
+import os
+import resource
+import tempfile
+
+import click
+
+import etl.glean
+import etl.http_cache
+from etl.glean import GleanApp
+from etl.snapshot import ReplayHttpCache, Snapshot
+
+from .synthetic import make_snapshot
+
+
+def _get_peak_rss() -> int:
+    # in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(snapshot_path, load_objects, results):
+    etl.http_cache.set_http_cache(ReplayHttpCache(Snapshot.load(snapshot_path)))
+    etl.glean._cache = etl.glean._Cache()
+    objects = []
+    for app in GleanApp.get_apps():
+        for url in app.get_probeinfo_urls():
+            # parse (and discard) everything, so both measurements include
+            # the transient cost of decoding the data
+            etl.glean._cache.get_json(url)
+        if load_objects:
+            objects.extend([app.get_metrics(), app.get_pings(), app.get_tags()])
+    results.put(_get_peak_rss())
+
+
+def measure_peak_rss(snapshot_path, load_objects) -> int:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(snapshot_path, load_objects, results))
+    process.start()
+    peak_rss = results.get()
+    process.join()
+    return peak_rss
+
+
+@click.command()
+@click.option("--metrics", "num_metrics", default=50000, show_default=True)
+@click.option("--pings", "num_pings", default=100, show_default=True)
+@click.option("--tags", "num_tags", default=500, show_default=True)
+def main(num_metrics, num_pings, num_tags):
+    snapshot = make_snapshot(
+        num_metrics=num_metrics, num_pings=num_pings, num_tags=num_tags, num_legacy_probes=10
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        snapshot_path = os.path.join(tmpdir, "snapshot.tar.gz")
+        snapshot.save(snapshot_path)
+        baseline = measure_peak_rss(snapshot_path, load_objects=False)
+        loaded = measure_peak_rss(snapshot_path, load_objects=True)
+
+    click.echo(f"peak RSS with the data loaded: {baseline / 1024:.1f} MiB")
+    click.echo(f"peak RSS with the objects built: {loaded / 1024:.1f} MiB")
+    click.echo(
+        f"objects: {(loaded - baseline) / 1024:.1f} MiB "
+        f"({(loaded - baseline) * 1024 / num_metrics:.0f} bytes per metric)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark building Looker links with `etl.urls`, against building them with
+`furl` (as we used to).
+
+Run with: python -m etl_tests.bench_urls
+"""
+
+import json
+import timeit
+
+import click
+from furl import furl
+
+from etl.urls import add_query_params, get_looker_explore_url
+
+
+def _get_params(i):
+    return {
+        "fields": f"metrics.submission_date,median_of_metric_{i}",
+        "dynamic_fields": json.dumps(
+            [{"measure": f"median_of_metric_{i}", "label": f"Median of metric_{i}"}]
+        ),
+    }
+
+
+def build_link_with_furl(i):
+    base_url = furl("https://mozilla.cloud.looker.com/explore/fenix/metrics").add(
+        {"f[metrics.channel]": "nightly"}
+    )
+    return furl(base_url.url).add(_get_params(i)).add({"toggle": "vis"}).url
+
+
+def build_link(i):
+    base_url = add_query_params(
+        get_looker_explore_url("fenix", "metrics"), {"f[metrics.channel]": "nightly"}
+    )
+    return add_query_params(add_query_params(base_url, _get_params(i)), {"toggle": "vis"})
+
+
+@click.command()
+@click.option("--links", "num_links", default=10000, show_default=True)
+def main(num_links):
+    assert all(build_link(i) == build_link_with_furl(i) for i in range(100))
+    for name, build in (("furl", build_link_with_furl), ("etl.urls", build_link)):
+        elapsed = timeit.timeit(lambda: [build(i) for i in range(num_links)], number=1)
+        click.echo(f"{name:>8}: {elapsed / num_links * 1e6:.1f}us per link")
+
+
+if __name__ == "__main__":
+    main()
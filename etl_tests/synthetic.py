@@ -0,0 +1,309 @@
+"""
+Generates a synthetic (but structurally realistic) snapshot of the upstream
+data consumed by the ETL, so we can exercise and benchmark a full build
+without network access.
+"""
+
+import json
+import os
+import tempfile
+
+import yaml
+
+import etl.glean
+import etl.http_cache
+from etl.firefox_legacy_etl import (
+    PROBE_RECORDED_IN_PROCESSES_URL,
+    PROBES_URL,
+    write_firefox_legacy_metadata,
+)
+from etl.glean import GleanApp
+from etl.glean_auto_events import AUTO_EVENTS_FILE_LIST_URL
+from etl.glean_etl import (
+    ANNOTATIONS_URL,
+    EXPERIMENT_DATA_URL,
+    FIREFOX_PRODUCT_DETAIL_URL,
+    NAMESPACES_URL,
+    write_glean_metadata,
+)
+from etl.snapshot import ReplayHttpCache, Snapshot
+
+METRIC_TYPES = (
+    "counter",
+    "boolean",
+    "string",
+    "labeled_counter",
+    "timing_distribution",
+    "timespan",
+    "quantity",
+    "event",
+    "datetime",
+    "uuid",
+)
+LIBRARY_PINGS = ("baseline", "metrics", "events", "deletion-request")
+AUTO_EVENTS_DATA_URL = "https://public-data.telemetry.mozilla.org/synthetic/auto_events.json"
+
+
+def _dates(i, first_year=2021):
+    return {
+        "first": f"{first_year + i % 3}-0{1 + i % 9}-1{i % 10} 10:00:00",
+        "last": f"{first_year + 3}-0{1 + i % 9}-1{i % 10} 10:00:00",
+    }
+
+
+def _metric(name, i, pings, tags, in_source=True):
+    metric_type = METRIC_TYPES[i % len(METRIC_TYPES)]
+    history = [
+        {
+            "bugs": [f"https://bugzilla.mozilla.org/show_bug.cgi?id={100000 + i}"],
+            "data_reviews": [],
+            "dates": _dates(i + offset),
+            "description": f"Synthetic metric {name} (revision {offset}).",
+            "disabled": False,
+            "expires": str(100 + i % 40) if i % 4 == 0 else "never",
+            "lifetime": "ping",
+            "metadata": {"tags": tags} if offset else {},
+            "notification_emails": ["glean-team@mozilla.com"],
+            "send_in_pings": pings,
+            "type": metric_type,
+        }
+        for offset in range(2)
+    ]
+    if metric_type == "event":
+        for definition in history:
+            definition["extra_keys"] = {"key": {"description": "An extra key", "type": "string"}}
+    return {"name": name, "in-source": in_source, "history": history}
+
+
+def _ping(name, i, include_client_id=True):
+    return {
+        "name": name,
+        "in-source": True,
+        "history": [
+            {
+                "dates": _dates(i),
+                "description": f"Synthetic ping {name}.",
+                "include_client_id": include_client_id,
+                "metadata": {"tags": []},
+                "notification_emails": ["glean-team@mozilla.com"],
+            }
+        ],
+    }
+
+
+def _tag(name, i):
+    return {"name": name, "history": [{"dates": _dates(i), "description": f"Tag {name}."}]}
+
+
+def _schema(ping):
+    return [
+        {"name": "client_info", "type": "RECORD", "mode": "NULLABLE", "fields": []},
+        {"name": "metrics", "type": "RECORD", "mode": "NULLABLE", "fields": []},
+        {"name": "ping_name", "type": "STRING", "mode": "NULLABLE", "description": ping},
+    ]
+
+
+def make_snapshot(num_metrics=200, num_pings=10, num_tags=20, num_legacy_probes=100) -> Snapshot:
+    snapshot = Snapshot()
+
+    def add_json(url, data):
+        snapshot.add_response(url, 200, json.dumps(data).encode("utf-8"))
+
+    apps = [
+        {
+            "app_name": "synthetic",
+            "app_id": f"org.mozilla.synthetic{suffix}",
+            "v1_name": f"synthetic{suffix}",
+            "app_channel": channel,
+            "app_description": "A synthetic application",
+            "canonical_app_name": "Synthetic",
+            "url": "https://github.com/mozilla/synthetic",
+            "notification_emails": ["glean-team@mozilla.com"],
+            "bq_dataset_family": f"org_mozilla_synthetic{suffix}",
+            "document_namespace": f"org-mozilla-synthetic{suffix}",
+        }
+        for (suffix, channel) in (("", "release"), ("_nightly", "nightly"))
+    ] + [
+        {
+            "app_name": "accounts_frontend",
+            "app_id": "accounts.frontend",
+            "v1_name": "accounts-frontend",
+            "app_description": "A synthetic web application",
+            "canonical_app_name": "Accounts Frontend",
+            "url": "https://github.com/mozilla/fxa",
+            "notification_emails": ["glean-team@mozilla.com"],
+            "bq_dataset_family": "accounts_frontend",
+            "document_namespace": "accounts-frontend",
+        }
+    ]
+    add_json(GleanApp.APPS_URL, apps)
+    add_json(
+        GleanApp.LIBRARIES_URL,
+        [{"library_name": "glean-core", "dependency_name": "glean-core", "v1_name": "glean-core"}],
+    )
+
+    # the shared library
+    add_json(
+        GleanApp.METRICS_URL_TEMPLATE.format("glean-core"),
+        {
+            "client_id": _metric("client_id", 0, ["glean_client_info"], []),
+            "glean.error.invalid_value": _metric("glean.error.invalid_value", 0, ["all-pings"], []),
+            "glean.validation.first_run_hour": _metric(
+                "glean.validation.first_run_hour", 8, ["metrics"], []
+            ),
+            "glean.element_click": _metric("glean.element_click", 7, ["events"], []),
+        },
+    )
+    add_json(
+        GleanApp.PING_URL_TEMPLATE.format("glean-core"),
+        {
+            name: _ping(name, i, include_client_id=name != "deletion-request")
+            for (i, name) in enumerate(LIBRARY_PINGS)
+        },
+    )
+
+    app_pings = [f"custom-ping-{i}" for i in range(num_pings)]
+    app_tags = [f"Component :: Area {i}" for i in range(num_tags)]
+    for app in apps:
+        v1_name = app["v1_name"]
+        add_json(GleanApp.DEPENDENCIES_URL_TEMPLATE.format(v1_name), {"glean-core": {}})
+        metric_count = num_metrics if app["app_name"] == "synthetic" else 10
+        # the nightly variant has a few metrics the release variant doesn't
+        if v1_name.endswith("nightly"):
+            metric_count += 5
+        add_json(
+            GleanApp.METRICS_URL_TEMPLATE.format(v1_name),
+            {
+                f"category{i % 17}.metric_{i}": _metric(
+                    f"category{i % 17}.metric_{i}",
+                    i,
+                    [app_pings[i % len(app_pings)], "metrics"],
+                    [app_tags[i % len(app_tags)]] if i % 3 else [],
+                    in_source=i % 11 != 0,
+                )
+                for i in range(metric_count)
+            },
+        )
+        add_json(
+            GleanApp.PING_URL_TEMPLATE.format(v1_name),
+            {name: _ping(name, i) for (i, name) in enumerate(app_pings)},
+        )
+        add_json(
+            GleanApp.TAGS_URL_TEMPLATE.format(v1_name),
+            {name: _tag(name, i) for (i, name) in enumerate(app_tags)},
+        )
+        for ping in app_pings + list(LIBRARY_PINGS):
+            snapshot.add_file(
+                f"schemas/{app['document_namespace']}/{ping}/{ping}.1.bq",
+                json.dumps(_schema(ping)).encode("utf-8"),
+            )
+
+    add_json(
+        ANNOTATIONS_URL,
+        {
+            "synthetic": {
+                "app": {"featured": True, "tags": ["Featured"]},
+                "metrics": {
+                    "category1.metric_1": {"commentary": "Some commentary", "tags": ["Special"]}
+                },
+                "tags": {"Special": "A special tag"},
+            }
+        },
+    )
+    snapshot.add_response(
+        NAMESPACES_URL,
+        200,
+        yaml.dump(
+            {
+                "synthetic": {
+                    "glean_app": True,
+                    "explores": {
+                        "metrics": {"type": "glean_ping_explore"},
+                        "events_stream": {"type": "events_explore"},
+                    },
+                },
+            }
+        ).encode("utf-8"),
+    )
+    add_json(FIREFOX_PRODUCT_DETAIL_URL, {f"{v}.0": f"20{v % 30:02d}-01-01" for v in range(1, 141)})
+    add_json(
+        EXPERIMENT_DATA_URL,
+        [
+            {
+                "slug": "synthetic-sampling",
+                "appName": "synthetic",
+                "channel": "release",
+                "featureIds": ["glean"],
+                "isEnrollmentPaused": False,
+                "startDate": "2024-01-01",
+                "endDate": None,
+                "targeting": "true",
+                "bucketConfig": {"count": 2500, "total": 10000},
+                "branches": [
+                    {
+                        "features": [
+                            {
+                                "featureId": "glean",
+                                "value": {
+                                    "gleanMetricConfiguration": {"category2.metric_2": False}
+                                },
+                            }
+                        ]
+                    }
+                ],
+            }
+        ],
+    )
+    add_json(AUTO_EVENTS_FILE_LIST_URL, [AUTO_EVENTS_DATA_URL])
+    add_json(
+        AUTO_EVENTS_DATA_URL,
+        [
+            {"app": "accounts_frontend", "event_name": f"glean.element_click.button_{i}"}
+            for i in range(5)
+        ],
+    )
+
+    add_json(
+        PROBES_URL,
+        {
+            f"histogram/PROBE_{i}": {
+                "name": f"PROBE_{i}",
+                "type": "histogram",
+                "history": {
+                    "nightly": [
+                        {
+                            "description": f"Legacy probe {i}",
+                            "bug_numbers": [i],
+                            "details": {"kind": "exponential"},
+                            "optout": False,
+                            "versions": {"first": "50", "last": "150"},
+                        }
+                    ]
+                },
+            }
+            for i in range(num_legacy_probes)
+        },
+    )
+    add_json(PROBE_RECORDED_IN_PROCESSES_URL, [{"metric": "probe_0", "processes": ["main"]}])
+
+    return snapshot
+
+
+def build_from_snapshot(snapshot: Snapshot, output_dir, functions_dir, **kwargs):
+    """
+    Run a full build against `snapshot`, without network access (keeping the
+    build manifest next to `output_dir`, unless given a `manifest_dir`)
+    """
+    kwargs.setdefault("manifest_dir", os.path.join(os.path.dirname(output_dir), "manifests"))
+    previous_http_cache = etl.http_cache._http_cache
+    previous_cache = etl.glean._cache
+    etl.http_cache.set_http_cache(ReplayHttpCache(snapshot))
+    etl.glean._cache = etl.glean._Cache()
+    try:
+        with tempfile.TemporaryDirectory(suffix="_mps") as mps_path:
+            snapshot.extract_files(mps_path)
+            write_glean_metadata(output_dir, functions_dir, mps_path=mps_path, **kwargs)
+        write_firefox_legacy_metadata(output_dir, functions_dir)
+    finally:
+        etl.http_cache.set_http_cache(previous_http_cache)
+        etl.glean._cache = previous_cache
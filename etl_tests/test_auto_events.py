@@ -1,5 +1,6 @@
 import pytest
-from etl.glean_auto_events import get_auto_events_for_app
+
+from etl.glean_auto_events import get_auto_events_for_app, index_auto_events_by_app
 
 
 # ruff: noqa: E501
@@ -243,3 +244,16 @@ def test_get_auto_pageload_events_for_app(mock_auto_pageload_events):
         == "An event triggered whenever the page /reset_password_verified is loaded."
     )
     assert auto_events[-1]["event_info"]["auto_event_id"] == "page_load[/reset_password_verified]"
+
+
+def test_index_auto_events_by_app(mock_auto_click_events, mock_auto_pageload_events):
+    other_app_event = {"app": "other_app", "event_name": "glean.element_click.foo", "count": "1"}
+    index = index_auto_events_by_app(
+        mock_auto_click_events + [other_app_event] + mock_auto_pageload_events
+    )
+
+    assert set(index) == {"accounts_frontend", "other_app"}
+    assert index["accounts_frontend"] == mock_auto_click_events + mock_auto_pageload_events
+    assert [e["name"] for e in get_auto_events_for_app("other_app", index["other_app"])] == [
+        "glean.element_click.foo"
+    ]
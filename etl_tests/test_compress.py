@@ -0,0 +1,33 @@
+import gzip
+import os
+
+from etl.compress import compress_directory, format_size_report
+
+
+def test_compress_directory(tmp_path):
+    (tmp_path / "app" / "metrics").mkdir(parents=True)
+    (tmp_path / "app" / "index.json").write_text('{"metrics": []}' * 100)
+    (tmp_path / "app" / "metrics" / "data_a.json").write_text("{}")
+    (tmp_path / ".manifest.json").write_text("{}")
+    (tmp_path / "app" / "logo.png").write_bytes(b"PNG")
+    (tmp_path / "app" / "logo.png.gz").write_bytes(b"")
+
+    stats = compress_directory(str(tmp_path), max_workers=2)
+    assert (stats["files"], stats["compressed"]) == (2, 2)
+    assert gzip.decompress((tmp_path / "app" / "index.json.gz").read_bytes()) == (
+        b'{"metrics": []}' * 100
+    )
+    assert not (tmp_path / ".manifest.json.gz").exists()
+    # images are already compressed (and any variants of them are removed)
+    assert not (tmp_path / "app" / "logo.png.gz").exists()
+    assert "Compressed 2 of 2 files" in format_size_report(stats)
+
+    # only files which changed are compressed again
+    os.utime(tmp_path / "app" / "metrics" / "data_a.json.gz", (0, 0))
+    stats = compress_directory(str(tmp_path), max_workers=2)
+    assert (stats["files"], stats["compressed"]) == (2, 1)
+
+    # variants of files which no longer exist are removed
+    os.unlink(tmp_path / "app" / "metrics" / "data_a.json")
+    compress_directory(str(tmp_path), max_workers=2)
+    assert os.listdir(tmp_path / "app" / "metrics") == []
@@ -1,6 +1,6 @@
 import pytest
 
-from etl.expiry import get_expiry_text, get_mapped_expiry
+from etl.expiry import ReleaseCatalog, get_expiry_text, get_mapped_expiry
 
 
 @pytest.fixture
@@ -24,3 +24,18 @@ def test_get_expiry_text(fake_product_details):
      [1.0](https://whattrainisitnow.com/)."
     )
     assert get_expiry_text("2021-01-01", "product", fake_product_details) == "2021-01-01"
+
+
+def test_release_catalog():
+    release_catalog = ReleaseCatalog({"99.0": "2022-04-05", "100.0": "2022-05-03"})
+    assert release_catalog.latest_release_version == "100.0"
+    assert release_catalog.get_release_date(99) == "2022-04-05"
+    assert get_mapped_expiry(100, "firefox_desktop", release_catalog) == "2022-05-03"
+    assert get_mapped_expiry("100", "firefox_desktop", release_catalog) == "2022-05-03"
+    # the string and integer versions of an expiry aren't mixed up, whichever
+    # is looked up (and memoized) first
+    assert get_expiry_text("100", "fenix", release_catalog) == "100"
+    assert get_expiry_text(100, "fenix", release_catalog).startswith("100. Latest release is")
+    release_catalog = ReleaseCatalog({"99.0": "2022-04-05", "100.0": "2022-05-03"})
+    assert get_expiry_text(100, "fenix", release_catalog).startswith("100. Latest release is")
+    assert get_expiry_text("100", "fenix", release_catalog) == "100"
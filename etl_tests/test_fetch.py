@@ -0,0 +1,39 @@
+import etl.fetch
+from etl.fetch import READ_TIMEOUT, RETRY_STATUSES, _JitteredRetry, get_session, reset_session
+
+
+def test_session_is_shared_and_retries():
+    session = get_session()
+    assert get_session() is session
+
+    adapter = session.get_adapter("https://probeinfo.telemetry.mozilla.org/")
+    assert isinstance(adapter.max_retries, _JitteredRetry)
+    assert set(adapter.max_retries.status_forcelist) == set(RETRY_STATUSES)
+
+
+def test_reset_session():
+    session = get_session()
+    reset_session()
+    assert get_session() is not session
+
+
+def test_jittered_backoff_is_bounded():
+    retry = _JitteredRetry(total=5, backoff_factor=1)
+    for _ in range(4):
+        retry = retry.increment(method="GET", url="/")
+    # un-jittered backoff after 4 consecutive errors is 1 * 2 ** 3
+    assert all(0 <= retry.get_backoff_time() <= 8 for _ in range(100))
+
+
+def test_get_sets_default_timeout(monkeypatch):
+    calls = []
+
+    class FakeSession:
+        def get(self, url, **kwargs):
+            calls.append(kwargs)
+
+    monkeypatch.setattr(etl.fetch, "_session", FakeSession())
+    etl.fetch.get("https://example.com")
+    etl.fetch.get("https://example.com", timeout=1)
+    assert calls[0]["timeout"][1] == READ_TIMEOUT
+    assert calls[1]["timeout"] == 1
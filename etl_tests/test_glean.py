@@ -1,12 +1,20 @@
+import json
+from datetime import datetime
+
+import git
 import pytest
 
-from etl.glean import GleanMetric
+import etl.glean
+from etl.glean import GleanApp, GleanMetric, _Cache, _get_date_range, prefetch_apps
 from etl.glean_etl import (
+    MPS_BRANCH,
+    _checkout_mps,
     _get_metric_sample_data,
     _is_metric_in_ping,
-    _normalize_metrics,
+    _pipeline_schema,
     _resolve_metric_collision,
 )
+from etl.identifiers import normalize_metric_name
 
 
 @pytest.fixture
@@ -89,6 +97,46 @@ def test_glean_metric(activeticks_metric_definition):
     assert metric.definition["date_first_seen"] == "2021-11-22 20:07:38"
 
 
+def test_glean_metric_dates(activeticks_metric_definition):
+    metric = GleanMetric(activeticks_metric_definition["name"], activeticks_metric_definition)
+    assert metric.get_first_added() == datetime(2021, 11, 22, 20, 7, 38)
+    assert metric.get_last_change() == max(
+        datetime.fromisoformat(d["dates"]["first"])
+        for d in activeticks_metric_definition["history"]
+    )
+
+
+def test_get_date_range():
+    assert _get_date_range(["2021-02-01 00:00:00", "2020-12-31 23:59:59"]) == (
+        "2020-12-31 23:59:59",
+        "2021-02-01 00:00:00",
+    )
+    # other formats are compared as the dates they represent
+    assert _get_date_range(["2021-02-01", "2020-12-31T23:59:59", "2021-01-01 00:00:00"]) == (
+        "2020-12-31T23:59:59",
+        "2021-02-01",
+    )
+
+
+def test_glean_metric_is_compact(activeticks_metric_definition):
+    metric = GleanMetric(
+        activeticks_metric_definition["name"], activeticks_metric_definition, ping_names=["metrics"]
+    )
+    assert not hasattr(metric, "__dict__")
+    assert not hasattr(metric, "definition_history")
+    # repeated strings are shared between metrics
+    other_metric = GleanMetric(
+        "other",
+        {
+            **activeticks_metric_definition,
+            "history": [
+                dict(activeticks_metric_definition["history"][-1], type="".join(["coun", "ter"]))
+            ],
+        },
+    )
+    assert other_metric.definition["type"] is metric.definition["type"]
+
+
 @pytest.fixture
 def sample_data_definition() -> dict:
     return {
@@ -381,7 +429,7 @@ def test_is_metric_in_ping_info_section(metric, ping_data):
 
 
 def test_normalize_metrics_collides_on_dots_vs_underscores():
-    assert _normalize_metrics("search.suggestions_latency") == _normalize_metrics(
+    assert normalize_metric_name("search.suggestions_latency") == normalize_metric_name(
         "search.suggestions.latency"
     )
 
@@ -412,3 +460,180 @@ def test_resolve_metric_collision_breaks_ties_on_recency():
     old_removed = {"name": "a.b", "in_source": False, "date_first_seen": "2024-01-01 00:00:00"}
     new_removed = {"name": "a_b", "in_source": False, "date_first_seen": "2025-01-01 00:00:00"}
     assert _resolve_metric_collision(old_removed, new_removed)[0] is new_removed
+
+
+class _FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+def test_prefetch_apps(monkeypatch):
+    fetched = []
+    responses = {
+        GleanApp.LIBRARIES_URL: [
+            {"library_name": "glean-core", "dependency_name": "glean-core", "v1_name": "glean-core"}
+        ],
+        GleanApp.DEPENDENCIES_URL_TEMPLATE.format("fenix"): {"glean-core": {}},
+    }
+
+    def fake_fetch(url):
+        fetched.append(url)
+        return _FakeResponse(responses.get(url, {}))
+
+    cache = _Cache()
+    monkeypatch.setattr(cache, "_fetch", fake_fetch)
+    monkeypatch.setattr(etl.glean, "_cache", cache)
+
+    app = GleanApp({"app_name": "fenix", "app_id": "org.mozilla.fenix", "v1_name": "fenix"})
+    prefetch_apps([app], max_workers=4)
+
+    assert sorted(fetched) == sorted(
+        [
+            GleanApp.LIBRARIES_URL,
+            GleanApp.DEPENDENCIES_URL_TEMPLATE.format("fenix"),
+            GleanApp.METRICS_URL_TEMPLATE.format("fenix"),
+            GleanApp.PING_URL_TEMPLATE.format("fenix"),
+            GleanApp.TAGS_URL_TEMPLATE.format("fenix"),
+            GleanApp.METRICS_URL_TEMPLATE.format("glean-core"),
+            GleanApp.PING_URL_TEMPLATE.format("glean-core"),
+        ]
+    )
+
+    # everything the app needs is now served from the cache
+    app.get_metrics()
+    app.get_pings()
+    app.get_tags()
+    assert len(fetched) == 7
+
+
+def _history(**definition):
+    return [
+        dict(
+            definition,
+            dates={"first": "2021-01-01 00:00:00", "last": "2022-01-01 00:00:00"},
+            metadata={},
+        )
+    ]
+
+
+def test_library_metrics_shared_between_apps(monkeypatch):
+    library_metric = {
+        "name": "glean.error.invalid_value",
+        "in-source": True,
+        "history": _history(send_in_pings=["all-pings"], type="labeled_counter"),
+    }
+    responses = {
+        GleanApp.LIBRARIES_URL: [
+            {"library_name": "glean-core", "dependency_name": "glean-core", "v1_name": "glean-core"}
+        ],
+        GleanApp.METRICS_URL_TEMPLATE.format("glean-core"): {
+            "glean.error.invalid_value": library_metric
+        },
+    }
+    for v1_name in ("fenix", "focus"):
+        responses[GleanApp.DEPENDENCIES_URL_TEMPLATE.format(v1_name)] = {"glean-core": {}}
+        responses[GleanApp.PING_URL_TEMPLATE.format(v1_name)] = {
+            f"{v1_name}-ping": {"name": f"{v1_name}-ping", "in-source": True, "history": _history()}
+        }
+    parsed = []
+
+    def fake_fetch(url):
+        return _FakeResponse(responses.get(url, {}))
+
+    def fake_get_json(url):
+        parsed.append(url)
+        return json.loads(json.dumps(responses.get(url, {})))
+
+    cache = _Cache()
+    monkeypatch.setattr(cache, "_fetch", fake_fetch)
+    monkeypatch.setattr(cache, "get_json", fake_get_json)
+    monkeypatch.setattr(etl.glean, "_cache", cache)
+
+    (fenix_metrics, focus_metrics) = [
+        GleanApp({"app_name": v1_name, "app_id": v1_name, "v1_name": v1_name}).get_metrics()
+        for v1_name in ("fenix", "focus")
+    ]
+    # the library's metrics were only parsed once...
+    assert parsed.count(GleanApp.METRICS_URL_TEMPLATE.format("glean-core")) == 1
+    assert fenix_metrics[0].definition["metadata"] is focus_metrics[0].definition["metadata"]
+    # ...but are sent in each app's own pings
+    assert fenix_metrics[0].definition["send_in_pings"] == {"fenix-ping"}
+    assert focus_metrics[0].definition["send_in_pings"] == {"focus-ping"}
+    assert fenix_metrics[0].definition["origin"] == "glean-core"
+
+
+def test_app_dependencies_and_pings_memoized(monkeypatch):
+    responses = {
+        GleanApp.LIBRARIES_URL: [
+            {"library_name": "glean-core", "dependency_name": "glean-core", "v1_name": "glean-core"}
+        ],
+        GleanApp.DEPENDENCIES_URL_TEMPLATE.format("fenix"): {"glean-core": {}},
+        GleanApp.PING_URL_TEMPLATE.format("fenix"): {
+            "metrics": {"name": "metrics", "in-source": True, "history": _history()}
+        },
+    }
+    parsed = []
+
+    def fake_get_json(url):
+        parsed.append(url)
+        return json.loads(json.dumps(responses.get(url, {})))
+
+    cache = _Cache()
+    monkeypatch.setattr(cache, "get_json", fake_get_json)
+    monkeypatch.setattr(etl.glean, "_cache", cache)
+
+    app = GleanApp({"app_name": "fenix", "app_id": "org.mozilla.fenix", "v1_name": "fenix"})
+    app.get_pings()
+    app.get_metrics()
+    app.get_probeinfo_urls()
+    for url in (
+        GleanApp.LIBRARIES_URL,
+        GleanApp.DEPENDENCIES_URL_TEMPLATE.format("fenix"),
+        GleanApp.PING_URL_TEMPLATE.format("fenix"),
+    ):
+        assert parsed.count(url) == 1
+
+    app.invalidate()
+    assert [ping.identifier for ping in app.get_pings()] == ["metrics"]
+    assert parsed.count(GleanApp.DEPENDENCIES_URL_TEMPLATE.format("fenix")) == 2
+    assert parsed.count(GleanApp.PING_URL_TEMPLATE.format("fenix")) == 2
+
+
+@pytest.fixture
+def mps_origin(tmp_path):
+    origin = git.Repo.init(tmp_path / "origin")
+    origin.git.config("uploadpack.allowFilter", "true")
+    origin.git.config("user.name", "test")
+    origin.git.config("user.email", "test@example.com")
+    origin.git.checkout("-b", MPS_BRANCH)
+    for namespace in ("namespace-a", "namespace-b"):
+        schema_dir = tmp_path / "origin" / "schemas" / namespace / "metrics"
+        schema_dir.mkdir(parents=True)
+        (schema_dir / "metrics.1.bq").write_text("[]")
+    origin.git.add("-A")
+    origin.git.commit("-m", "initial schemas")
+    return origin
+
+
+def test_checkout_mps(tmp_path, mps_origin):
+    checkout_path = str(tmp_path / "checkout")
+    url = f"file://{mps_origin.working_dir}"
+
+    _checkout_mps(checkout_path, {"namespace-a"}, url=url)
+    assert _pipeline_schema(checkout_path, "namespace-a/metrics/metrics.1.bq") == []
+    # only the namespaces we asked for are checked out
+    assert not (tmp_path / "checkout" / "schemas" / "namespace-b").exists()
+
+    # later builds pick up new commits, and can change the namespaces
+    schema_path = tmp_path / "origin" / "schemas" / "namespace-b" / "metrics" / "metrics.1.bq"
+    schema_path.write_text('[{"name": "new_field"}]')
+    mps_origin.git.commit("-am", "update schemas")
+
+    _checkout_mps(checkout_path, {"namespace-b"}, url=url)
+    assert _pipeline_schema(checkout_path, "namespace-b/metrics/metrics.1.bq") == [
+        {"name": "new_field"}
+    ]
+    assert not (tmp_path / "checkout" / "schemas" / "namespace-a").exists()
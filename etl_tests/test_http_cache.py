@@ -0,0 +1,98 @@
+import pytest
+import requests
+
+import etl.fetch
+from etl.http_cache import HttpCache
+
+
+class _FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i : i + chunk_size]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code)
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    requests_made = []
+    server = {"content": b'{"a": 1}', "etag": '"v1"'}
+
+    def fake_get(url, headers=None, stream=False):
+        requests_made.append((url, headers))
+        if headers and headers.get("If-None-Match") == server["etag"]:
+            return _FakeResponse(304)
+        if url.endswith("/missing"):
+            return _FakeResponse(404)
+        return _FakeResponse(200, server["content"], {"ETag": server["etag"]})
+
+    monkeypatch.setattr(etl.fetch, "get", fake_get)
+    server["requests"] = requests_made
+    return server
+
+
+def test_http_cache_revalidates(tmp_path, fake_server):
+    cache = HttpCache(str(tmp_path))
+
+    resp = cache.get("https://example.com/data")
+    assert resp.json() == {"a": 1}
+    assert not resp.from_cache
+    assert fake_server["requests"][-1][1] == {}
+
+    # a second request is conditional, and served from disk
+    resp = cache.get("https://example.com/data")
+    assert resp.json() == {"a": 1}
+    assert resp.from_cache
+    assert fake_server["requests"][-1][1] == {"If-None-Match": '"v1"'}
+
+    # when upstream changes, we pick up the new version
+    fake_server.update(content=b'{"a": 2}', etag='"v2"')
+    resp = cache.get("https://example.com/data")
+    assert resp.json() == {"a": 2}
+    assert not resp.from_cache
+
+
+def test_http_cache_does_not_store_errors(tmp_path, fake_server):
+    cache = HttpCache(str(tmp_path))
+    assert cache.get("https://example.com/missing").status_code == 404
+    assert cache.stats()["entries"] == 0
+
+
+def test_http_cache_prune(tmp_path, fake_server):
+    cache = HttpCache(str(tmp_path))
+    for i in range(3):
+        cache.get(f"https://example.com/data/{i}")
+    assert cache.stats() == {"directory": str(tmp_path), "entries": 3, "size": 24}
+
+    assert cache.prune(max_size=16) == 1
+    assert cache.stats()["entries"] == 2
+    assert cache.prune(max_size=0) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_http_cache_get_file(tmp_path, fake_server):
+    cache = HttpCache(str(tmp_path))
+
+    with cache.get_file("https://example.com/data") as f:
+        assert f.read() == b'{"a": 1}'
+    # the streamed copy is revalidated like any other
+    with cache.get_file("https://example.com/data") as f:
+        assert f.read() == b'{"a": 1}'
+    assert fake_server["requests"][-1][1] == {"If-None-Match": '"v1"'}
+    assert cache.get("https://example.com/data").from_cache
+
+    with pytest.raises(requests.HTTPError):
+        cache.get_file("https://example.com/missing")
@@ -0,0 +1,55 @@
+import pytest
+import stringcase
+
+from etl.identifiers import etl_snake_case, normalize_metric_name, normalize_metric_names, snakecase
+
+
+@pytest.mark.parametrize(
+    "identifier",
+    [
+        "",
+        "metrics",
+        "deletion-request",
+        "fog.validation",
+        "topSites",
+        "URLBar.engagement",
+        "a b\tc",
+        "HTTPRequest",
+        "_leading",
+        "Already_snake_case",
+    ],
+)
+def test_snakecase_matches_stringcase(identifier):
+    assert snakecase(identifier) == stringcase.snakecase(identifier)
+
+
+@pytest.mark.parametrize(
+    "line,expected",
+    [
+        ("", ""),
+        ("metrics.counter", "metrics_counter"),
+        ("topSites", "top_sites"),
+        ("URLBar.engagement", "url_bar_engagement"),
+        (
+            "scalars/browser.engagement.tabOpenEventCount",
+            "scalars_browser_engagement_tab_open_event_count",
+        ),
+        ("A7Aa", "a7_aa"),
+    ],
+)
+def test_etl_snake_case(line, expected):
+    assert etl_snake_case(line) == expected
+
+
+def test_normalize_metric_name():
+    assert normalize_metric_name("metrics.search_count") == "data_metrics_search_count"
+    assert normalize_metric_name("a/b[c]") == "data_a_b_c_"
+    assert normalize_metric_name("ads.ad_impression") == "data_ads_advert_impression"
+
+
+def test_normalize_metric_names():
+    names = ["metrics.search_count", "ads.ad_impression", "metrics.search_count"]
+    assert normalize_metric_names(names) == {
+        "metrics.search_count": "data_metrics_search_count",
+        "ads.ad_impression": "data_ads_advert_impression",
+    }
@@ -1,7 +1,7 @@
 import pytest
 
 from etl.glean import GleanApp, GleanMetric, GleanPing
-from etl.looker import get_looker_explores_for_metric, get_looker_explores_for_ping
+from etl.looker import LookerExplores, get_looker_explores_for_metric, get_looker_explores_for_ping
 
 
 @pytest.fixture
@@ -127,3 +127,24 @@ def test_get_looker_explores_for_metric_unioned_app(
             },
         }
     ]
+
+
+def test_looker_explores(
+    fake_namespaces, fake_app, fake_app_group, fake_ping, fake_timespan_metric
+):
+    looker_explores = LookerExplores(fake_namespaces)
+    assert looker_explores.explores == {("fenix", "metrics")}
+
+    # the base explores for a ping are only worked out once
+    base_explores = get_looker_explores_for_ping(
+        looker_explores, fake_app, fake_app_group, fake_ping
+    )
+    assert base_explores == get_looker_explores_for_ping(
+        fake_namespaces, fake_app, fake_app_group, fake_ping
+    )
+    assert looker_explores.get_ping_explores(fake_app, fake_app_group, "metrics") is base_explores
+    assert get_looker_explores_for_metric(
+        looker_explores, fake_app, fake_app_group, fake_timespan_metric, "metrics", False
+    ) == get_looker_explores_for_metric(
+        fake_namespaces, fake_app, fake_app_group, fake_timespan_metric, "metrics", False
+    )
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from etl.output import OutputWriter
+
+
+def test_write_if_changed(tmp_path):
+    path = str(tmp_path / "data.json")
+    output = OutputWriter()
+    output.write(path, "[1]")
+    os.utime(path, (0, 0))
+
+    # identical content isn't rewritten
+    output.write(path, b"[1]")
+    assert os.path.getmtime(path) == 0
+
+    output.write(path, "[2]")
+    assert open(path).read() == "[2]"
+    assert dict(output.counts) == {"written": 2, "skipped": 1, "deleted": 0}
+    # no temporary files are left behind
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_remove_stale(tmp_path):
+    (tmp_path / "metrics" / "old").mkdir(parents=True)
+    (tmp_path / "metrics" / "old" / "data_removed.json").write_text("{}")
+    (tmp_path / "metrics" / "data_kept.json").write_text("{}")
+    (tmp_path / "metrics" / "data_kept.json.gz").write_bytes(b"")
+    (tmp_path / "logo.png").write_text("")
+
+    output = OutputWriter()
+    output.write(str(tmp_path / "metrics" / "data_current.json"), "{}")
+    output.remove_stale(str(tmp_path), keep=[str(tmp_path / "metrics" / "data_kept.json")])
+
+    assert sorted(
+        os.path.relpath(os.path.join(root, f), tmp_path)
+        for (root, _, files) in os.walk(tmp_path)
+        for f in files
+    ) == ["metrics/data_current.json", "metrics/data_kept.json", "metrics/data_kept.json.gz"]
+    assert output.counts["deleted"] == 2
+    assert output.report("Test") == "Test: wrote 1 files, skipped 0 unchanged, deleted 2 stale"
+
+
+def test_background_writes(tmp_path):
+    with OutputWriter(threads=3) as output:
+        for i in range(100):
+            output.write(str(tmp_path / f"{i % 10}.json"), f"[{i}]")
+        output.flush()
+        # the last write to each path wins
+        assert [open(tmp_path / f"{i}.json").read() for i in range(10)] == [
+            f"[{90 + i}]" for i in range(10)
+        ]
+    assert output.counts["written"] == 100
+
+
+def test_background_write_error(tmp_path):
+    output = OutputWriter(threads=2)
+    output.write(str(tmp_path / "missing" / "data.json"), "{}")
+    with pytest.raises(FileNotFoundError):
+        output.flush()
+    output.close()
+
+
+def test_write_error_while_handling_another(tmp_path, caplog):
+    with pytest.raises(KeyError):
+        with OutputWriter(threads=2) as output:
+            output.write(str(tmp_path / "missing" / "data.json"), "{}")
+            raise KeyError("original error")
+    assert "Error writing output" in caplog.text
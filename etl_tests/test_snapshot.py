@@ -0,0 +1,269 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import etl.glean_etl
+from etl.glean import GleanApp
+from etl.glean_auto_events import AUTO_EVENTS_FILE_LIST_URL
+from etl.glean_etl import ANNOTATIONS_URL
+from etl.snapshot import ReplayHttpCache, Snapshot, SnapshotMissError
+
+from .synthetic import AUTO_EVENTS_DATA_URL, _metric, build_from_snapshot, make_snapshot
+
+
+def test_snapshot_roundtrip(tmp_path):
+    snapshot = Snapshot()
+    snapshot.add_response("https://example.com/a", 200, b'{"a": 1}')
+    snapshot.add_response("https://example.com/missing", 404, b"Not Found")
+    snapshot.add_file("schemas/ns/ping/ping.1.bq", b"[]")
+    snapshot.save(str(tmp_path / "snapshot.tar"))
+
+    replay = ReplayHttpCache(Snapshot.load(str(tmp_path / "snapshot.tar")))
+    assert replay.get("https://example.com/a").json() == {"a": 1}
+    assert replay.get("https://example.com/missing").status_code == 404
+    with pytest.raises(SnapshotMissError):
+        replay.get("https://example.com/unknown")
+
+
+def test_build_from_snapshot(tmp_path):
+    (output_dir, functions_dir) = (tmp_path / "data", tmp_path / "functions")
+    os.makedirs(functions_dir)
+    build_from_snapshot(make_snapshot(num_metrics=30), str(output_dir), str(functions_dir))
+
+    apps = json.loads((output_dir / "apps.json").read_text())
+    assert [app["app_name"] for app in apps] == ["synthetic", "accounts_frontend"]
+
+    index = json.loads((output_dir / "synthetic" / "index.json").read_text())
+    # 30 app metrics + 5 nightly-only ones + the 4 library metrics
+    assert len(index["metrics"]) == 39
+    assert {ping["name"] for ping in index["pings"]} >= {"baseline", "custom-ping-0"}
+
+    metric = json.loads(
+        (output_dir / "synthetic" / "metrics" / "data_category1_metric_1.json").read_text()
+    )
+    assert metric["commentary"] == "Some commentary"
+    assert [variant["id"] for variant in metric["variants"]] == [
+        "org.mozilla.synthetic",
+        "org.mozilla.synthetic_nightly",
+    ]
+
+    # ping files list the metrics sent in them, only including the client id
+    # if the ping does
+    def ping_metrics(ping_name):
+        ping = json.loads((output_dir / "synthetic" / "pings" / f"{ping_name}.json").read_text())
+        return [metric["name"] for metric in ping["metrics"]]
+
+    assert ping_metrics("baseline") == ["client_id", "glean.error.invalid_value"]
+    assert ping_metrics("deletion-request") == ["glean.error.invalid_value"]
+    # every metric but the element click event
+    assert len(ping_metrics("metrics")) == 38
+
+    # tables reference their (shared) schema by hash
+    tables = [
+        json.loads((output_dir / "synthetic" / "tables" / app_id / "baseline.json").read_text())
+        for app_id in ("org_mozilla_synthetic", "org_mozilla_synthetic_nightly")
+    ]
+    assert tables[0]["bq_schema_hash"] == tables[1]["bq_schema_hash"]
+    schema_path = output_dir / "schemas" / f"{tables[0]['bq_schema_hash']}.json"
+    assert json.loads(schema_path.read_text())[-1]["description"] == "baseline"
+
+    # auto events are expanded from the element click event
+    accounts_index = json.loads((output_dir / "accounts_frontend" / "index.json").read_text())
+    assert "glean.element_click.button_0" in {m["name"] for m in accounts_index["metrics"]}
+
+    assert (output_dir / "firefox_legacy" / "metrics" / "data_probe_0.json").exists()
+
+
+def test_build_duplicate_ping(tmp_path):
+    snapshot = make_snapshot(num_metrics=30)
+    url = GleanApp.METRICS_URL_TEMPLATE.format("synthetic")
+    metrics = json.loads(snapshot.responses[url][1])
+    metrics["category0.duplicate"] = _metric("category0.duplicate", 0, ["baseline", "baseline"], [])
+    snapshot.add_response(url, 200, json.dumps(metrics).encode("utf-8"))
+
+    (output_dir, functions_dir) = (tmp_path / "data", tmp_path / "functions")
+    os.makedirs(functions_dir)
+    build_from_snapshot(snapshot, str(output_dir), str(functions_dir))
+    ping = json.loads((output_dir / "synthetic" / "pings" / "baseline.json").read_text())
+    names = [metric["name"] for metric in ping["metrics"]]
+    assert names.count("category0.duplicate") == 1
+
+
+def test_build_with_jobs(tmp_path):
+    def build(name, **kwargs):
+        (output_dir, functions_dir) = (tmp_path / name / "data", tmp_path / name / "functions")
+        os.makedirs(functions_dir)
+        build_from_snapshot(snapshot, str(output_dir), str(functions_dir), **kwargs)
+        return {
+            str(path.relative_to(output_dir)): path.read_bytes()
+            for path in output_dir.rglob("*")
+            if path.is_file()
+        }
+
+    snapshot = make_snapshot(num_metrics=30)
+    assert build("parallel", jobs=2) == build("serial")
+
+
+def test_build_streaming_metrics(tmp_path, caplog):
+    def build(name, **kwargs):
+        (output_dir, functions_dir) = (tmp_path / name / "data", tmp_path / name / "functions")
+        os.makedirs(functions_dir)
+        build_from_snapshot(snapshot, str(output_dir), str(functions_dir), **kwargs)
+        return {
+            str(path.relative_to(tmp_path / name)): path.read_bytes()
+            for directory in (output_dir, functions_dir)
+            for path in directory.rglob("*")
+            if path.is_file()
+        }
+
+    def add_metrics(v1_name, metrics):
+        url = GleanApp.METRICS_URL_TEMPLATE.format(v1_name)
+        data = json.loads(snapshot.responses[url][1])
+        for name, (i, pings) in metrics.items():
+            data[name] = _metric(name, i, pings, [], in_source=i % 2 == 0)
+        snapshot.add_response(url, 200, json.dumps(data).encode("utf-8"))
+
+    snapshot = make_snapshot(num_metrics=30)
+    # metrics whose names collide with others (in the same or another
+    # variant), and a second base for the automatic events
+    add_metrics("synthetic", {"category1.metric.1": (3, ["metrics"])})
+    add_metrics("synthetic_nightly", {"category2.metric.2": (4, ["metrics"])})
+    add_metrics("synthetic_nightly", {"category3.metric.32": (5, ["metrics"])})
+    add_metrics("synthetic", {"category3_metric.32": (6, ["metrics"])})
+    add_metrics("glean-core", {"glean.page_load": (7, ["events"])})
+
+    streamed = build("streamed", stream_metrics=True)
+    assert caplog.text.count("Metric name collision") == 3
+    assert "data/synthetic/metrics/data_category3_metric_32.json" in streamed
+    assert "data/accounts_frontend/metrics/data_glean_element_click_button_0.json" in streamed
+    assert streamed == build("buffered")
+
+
+def test_incremental_build(tmp_path, monkeypatch):
+    (output_dir, functions_dir) = (tmp_path / "data", tmp_path / "functions")
+    os.makedirs(functions_dir)
+
+    built = []
+    write_app_group = etl.glean_etl._write_app_group
+
+    def _write_app_group(context, app_name, app_group, apps):
+        built.append(app_name)
+        return write_app_group(context, app_name, app_group, apps)
+
+    monkeypatch.setattr(etl.glean_etl, "_write_app_group", _write_app_group)
+
+    def build(snapshot, **kwargs):
+        built.clear()
+        build_from_snapshot(snapshot, str(output_dir), str(functions_dir), **kwargs)
+        return sorted(built)
+
+    # (a manifest from when they were kept in the output directory)
+    os.makedirs(output_dir)
+    (output_dir / ".manifest.json").write_text("{}")
+
+    snapshot = make_snapshot(num_metrics=30)
+    assert build(snapshot) == ["accounts_frontend", "synthetic"]
+    apps = (output_dir / "apps.json").read_text()
+
+    # nothing changed, so nothing is rebuilt (but the list of apps is the same)
+    assert build(snapshot) == []
+    assert (output_dir / "apps.json").read_text() == apps
+    assert (output_dir / "synthetic" / "index.json").exists()
+    # the manifest isn't published with the output
+    assert not (output_dir / ".manifest.json").exists()
+    assert len(os.listdir(tmp_path / "manifests")) == 1
+
+    # a fresh functions directory gets the search indexes written again
+    shutil.rmtree(functions_dir)
+    os.makedirs(functions_dir)
+    assert build(snapshot) == ["accounts_frontend", "synthetic"]
+    assert (functions_dir / "metrics_search_synthetic.js").exists()
+    assert build(snapshot) == []
+
+    # as does a different functions directory
+    functions_dir = tmp_path / "other_functions"
+    os.makedirs(functions_dir)
+    assert build(snapshot) == ["accounts_frontend", "synthetic"]
+
+    # changing the annotations for one app only rebuilds that app
+    annotations = snapshot.responses[ANNOTATIONS_URL][1]
+    snapshot.add_response(
+        ANNOTATIONS_URL, 200, annotations.replace(b"Some commentary", b"Other commentary")
+    )
+    assert build(snapshot) == ["synthetic"]
+    metric = json.loads(
+        (output_dir / "synthetic" / "metrics" / "data_category1_metric_1.json").read_text()
+    )
+    assert metric["commentary"] == "Other commentary"
+
+    # as does changing an app's logo (even if its URL stays the same)
+    logo_url = "https://example.com/synthetic.png"
+    annotations = json.loads(snapshot.responses[ANNOTATIONS_URL][1])
+    annotations["synthetic"]["app"]["logo"] = logo_url
+    snapshot.add_response(ANNOTATIONS_URL, 200, json.dumps(annotations).encode("utf-8"))
+    snapshot.add_response(logo_url, 200, b"old logo")
+    assert build(snapshot) == ["synthetic"]
+    snapshot.add_response(logo_url, 200, b"new logo")
+    assert build(snapshot) == ["synthetic"]
+    assert (output_dir / "synthetic" / "logo.png").read_bytes() == b"new logo"
+
+    assert build(snapshot, force=True) == ["accounts_frontend", "synthetic"]
+
+
+def test_build_without_auto_events(tmp_path):
+    # the automatic events are only needed if an app has one of their bases
+    snapshot = make_snapshot(num_metrics=30)
+    library_metrics_url = GleanApp.METRICS_URL_TEMPLATE.format("glean-core")
+    library_metrics = json.loads(snapshot.responses[library_metrics_url][1])
+    del library_metrics["glean.element_click"]
+    snapshot.add_response(library_metrics_url, 200, json.dumps(library_metrics).encode("utf-8"))
+    for url in (AUTO_EVENTS_FILE_LIST_URL, AUTO_EVENTS_DATA_URL):
+        del snapshot.responses[url]
+
+    (output_dir, functions_dir) = (tmp_path / "data", tmp_path / "functions")
+    os.makedirs(functions_dir)
+    build_from_snapshot(snapshot, str(output_dir), str(functions_dir))
+    assert not os.path.exists(
+        output_dir / "accounts_frontend" / "metrics" / "data_glean_element_click.json"
+    )
+
+
+def test_removed_app_group(tmp_path):
+    (output_dir, functions_dir) = (tmp_path / "data", tmp_path / "functions")
+    os.makedirs(functions_dir)
+    (functions_dir / "search.js").write_text("")
+
+    snapshot = make_snapshot(num_metrics=30)
+    build_from_snapshot(snapshot, str(output_dir), str(functions_dir))
+    assert (output_dir / "accounts_frontend" / "index.json").exists()
+    assert (functions_dir / "metrics_search_accounts_frontend.js").exists()
+
+    apps = json.loads(snapshot.responses[GleanApp.APPS_URL][1])
+    apps = [app for app in apps if app["app_name"] != "accounts_frontend"]
+    snapshot.add_response(GleanApp.APPS_URL, 200, json.dumps(apps).encode("utf-8"))
+    build_from_snapshot(snapshot, str(output_dir), str(functions_dir))
+    assert not (output_dir / "accounts_frontend").exists()
+    assert sorted(os.listdir(functions_dir)) == [
+        "glam_metrics_blocklist.json",
+        "metrics_search_firefox_legacy.js",
+        "metrics_search_fog_and_legacy.js",
+        "metrics_search_synthetic.js",
+        "search.js",
+        "supported_glam_metric_types.json",
+    ]
+
+
+def test_stale_files_removed(tmp_path):
+    (output_dir, functions_dir) = (tmp_path / "data", tmp_path / "functions")
+    os.makedirs(functions_dir)
+    metric_path = output_dir / "synthetic" / "metrics" / "data_category10_metric_27.json"
+
+    build_from_snapshot(make_snapshot(num_metrics=30), str(output_dir), str(functions_dir))
+    assert metric_path.exists()
+    schemas = set(os.listdir(output_dir / "schemas"))
+
+    build_from_snapshot(make_snapshot(num_metrics=20), str(output_dir), str(functions_dir))
+    assert not metric_path.exists()
+    assert set(os.listdir(output_dir / "schemas")) == schemas
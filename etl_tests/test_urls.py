@@ -0,0 +1,51 @@
+import json
+
+import pytest
+from furl import furl
+
+from etl.urls import add_query_params, get_looker_explore_url
+
+# keys and values with characters which need encoding (or which furl leaves as-is)
+TRICKY_STRINGS = [
+    "",
+    "nightly",
+    "f[metrics.channel]",
+    '"my_event"',
+    "a b",
+    "a+b",
+    "a&b=c",
+    "a,b;c:d@e/f?g#h",
+    "~-._*'()!$",
+    "100%",
+    "café ☃ \U0001f600",
+    json.dumps([{"measure": "median_of_x", "label": "Median of x", "expression": ""}]),
+]
+
+
+@pytest.mark.parametrize("value", TRICKY_STRINGS)
+@pytest.mark.parametrize(
+    "base_url",
+    [
+        "https://mozilla.cloud.looker.com/dashboards/1452",
+        "https://mozilla.cloud.looker.com/explore/fenix/metrics?f%5Bmetrics.channel%5D=nightly",
+    ],
+)
+def test_add_query_params_matches_furl(base_url, value):
+    params = {value or "key": value, "fields": f"metrics.submission_date,{value}"}
+    assert add_query_params(base_url, params) == furl(base_url).add(params).url
+    # adding params bit by bit gives the same result as adding them at once
+    url = add_query_params(add_query_params(base_url, params), {"toggle": "vis"})
+    assert url == furl(base_url).add(params).add({"toggle": "vis"}).url
+
+
+def test_add_no_query_params():
+    url = "https://mozilla.cloud.looker.com/dashboards/1452"
+    assert add_query_params(url, {}) == url == furl(url).add({}).url
+
+
+@pytest.mark.parametrize("explore_name", ["metrics", "events_stream", "a b", "café", "a;b=c:d@e"])
+def test_looker_explore_url_matches_furl(explore_name):
+    assert (
+        get_looker_explore_url("fenix", explore_name)
+        == furl(f"https://mozilla.cloud.looker.com/explore/fenix/{explore_name}").url
+    )
@@ -0,0 +1,78 @@
+import io
+import json
+import os
+
+import pytest
+
+from etl import utils
+from etl.utils import (
+    JSON_BACKENDS,
+    dump_json,
+    dump_json_bytes,
+    iter_json_object_items,
+    write_atomic,
+)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1024])
+def test_iter_json_object_items(chunk_size):
+    data = {
+        "histogram/A11Y_INSTANTIATED_FLAG": {"type": "flag", "labels": ["é", "ü"]},
+        "scalar/a.b": {"numbers": [1, 12345, 1.5e10], "empty": {}},
+        "count": 12345,
+        "nothing": None,
+    }
+    for document in (json.dumps(data), json.dumps(data, indent=2, ensure_ascii=False)):
+        items = list(iter_json_object_items(io.BytesIO(document.encode("utf-8")), chunk_size))
+        assert items == list(data.items())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+def test_iter_json_object_items_split_numbers(chunk_size):
+    # numbers at the top level of the object, which any chunk boundary may split
+    for document in ('{"a": 1.5, "b": 2}', '{"a":-3e5,"b":2.25E-3 }', '{"a": 10,\n"b": 0}'):
+        items = list(iter_json_object_items(io.BytesIO(document.encode("utf-8")), chunk_size))
+        assert items == list(json.loads(document).items())
+
+
+def test_iter_json_object_items_empty():
+    assert list(iter_json_object_items(io.BytesIO(b" { } "))) == []
+
+
+def test_iter_json_object_items_invalid():
+    with pytest.raises(ValueError):
+        list(iter_json_object_items(io.BytesIO(b'["not", "an", "object"]')))
+    with pytest.raises(ValueError):
+        list(iter_json_object_items(io.BytesIO(b'{"truncated": {"a": 1')))
+
+
+@pytest.mark.parametrize("backend", sorted(JSON_BACKENDS))
+def test_dump_json(backend, monkeypatch):
+    monkeypatch.setattr(utils, "_dump_json_bytes", JSON_BACKENDS[backend])
+    data = {
+        "name": "category1.metric_2e5",
+        "description": "Résumé “quoted” \x7f\x00 😀 \u2028",
+        "numbers": [0, -1, 2**63, 1.5, -0.0, 1e16, 1e-05, 123.0001, 5e-324],
+        "tags": {"a"},
+        "nested": [{"x": None, "y": True}, []],
+    }
+    expected = json.dumps(data, separators=(",", ":"), default=list)
+    assert dump_json(data) == expected
+    assert dump_json_bytes(data) == expected.encode("ascii")
+    # integers which don't fit in 64 bits, and non-string keys
+    for data in ({"big": -(2**70)}, {1: "one", None: "none"}):
+        assert dump_json(data) == json.dumps(data, separators=(",", ":"))
+    with pytest.raises(ValueError):
+        dump_json({"unserializable": object()})
+
+
+def test_write_atomic(tmp_path):
+    path = str(tmp_path / "data.json")
+    assert write_atomic(path, [b"{", b"}"]) == 2
+    with open(path, "rb") as f:
+        assert f.read() == b"{}"
+    # the same permissions a plain `open` would give
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~umask
+    assert os.listdir(tmp_path) == ["data.json"]
@@ -34,5 +34,13 @@ export async function getMetricData(appName, metricName) {
 }
 
 export async function getTableData(appName, appId, pingName) {
-  return fetchJSON(`/data/${appName}/tables/${appId}/${pingName}.json`);
+  const tableData = await fetchJSON(
+    `/data/${appName}/tables/${appId}/${pingName}.json`
+  );
+  // BigQuery schemas are shared between many tables, so they are stored
+  // separately (keyed by a hash of their contents)
+  const bqSchema = await fetchJSON(
+    `/data/schemas/${tableData.bq_schema_hash}.json`
+  );
+  return { ...tableData, bq_schema: bqSchema };
 }